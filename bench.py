@@ -0,0 +1,229 @@
+"""Benchmark suite: canonical seeded scenes, timed stage by stage.
+
+    python bench.py --output bench.json
+    python bench.py --scenes sr100 sr1k --compare bench.json
+
+Every scene is Flant text with a fixed seed, so each run simulates exactly the
+same bodies. A case is a scene with one gravity mode; it reports the time spent
+in each stage (gravity, collisions, integration, render), steps/sec, gravity
+pairs/sec, broad-phase collision pairs/sec and the peak traced memory of
+building the scene and running one step. Peak memory is measured in a separate
+pass with tracemalloc, so tracing does not slow the timed steps.
+
+Rendering uses the SDL dummy video driver, so no window is opened.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from config import Config
+from parse import parse_build_text
+from simulation import Simulation
+from settings import SCREEN_WIDTH, SCREEN_HEIGHT
+
+BENCH_SEED = 2024
+RENDER_FRAMES = 20
+
+
+def _black_holes(count, seed):
+    """b() lines for black holes spread over the screen, from their own fixed seed."""
+    rng = np.random.default_rng(seed)
+    x = rng.integers(100, SCREEN_WIDTH - 100, count)
+    y = rng.integers(100, SCREEN_HEIGHT - 100, count)
+    mass = rng.integers(500, 5000, count)
+    return "".join(f"b({x[i]}, {y[i]}, {mass[i]})\n" for i in range(count))
+
+
+def _scene(bodies, black_holes=0):
+    return f"seed = {BENCH_SEED}\nsr({bodies}, 1, 50, 2, 4)\n" + _black_holes(black_holes, BENCH_SEED)
+
+
+# Scene name -> (Flant text, gravity modes to run it with)
+SCENES = {
+    "sr100": (_scene(100), ("python", "numpy", "barnes_hut")),
+    "sr1k": (_scene(1000), ("numpy", "barnes_hut")),
+    "sr10k": (_scene(10000), ("numpy", "barnes_hut")),
+    "sr100k": (_scene(100000), ("barnes_hut",)),
+    "bh100": (_scene(100, black_holes=20), ("numpy", "barnes_hut")),
+    "bh1k": (_scene(1000, black_holes=100), ("numpy", "barnes_hut")),
+}
+
+
+class TimedSimulation(Simulation):
+    """Simulation that adds up the wall time of its collision and gravity stages."""
+
+    def __init__(self, store, config=None, events=None):
+        super().__init__(store, config, events)
+        self.collide_time = 0.0
+        self.gravity_time = 0.0
+        self.candidate_pairs = 0
+
+    def collide(self):
+        start = time.perf_counter()
+        super().collide()
+        self.collide_time += time.perf_counter() - start
+        self.candidate_pairs += self.collision_candidates
+
+    def accelerations(self, x, y, targets=None):
+        start = time.perf_counter()
+        result = super().accelerations(x, y, targets)
+        self.gravity_time += time.perf_counter() - start
+        return result
+
+
+def build(scene, mode):
+    """(BodyStore, Config) of a scene with the given gravity mode."""
+    text, _ = SCENES[scene]
+    store, settings = parse_build_text(text, scene)
+    return store, Config(**{**settings, "GRAVITY_MODE": mode})
+
+
+def peak_memory(scene, mode):
+    """Peak traced bytes while building the scene and running one step."""
+    tracemalloc.start()
+    try:
+        store, config = build(scene, mode)
+        Simulation(store, config).step()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def time_render(store, config, frames=RENDER_FRAMES):
+    """Seconds per full frame of the current state, drawn with the dummy video driver."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame  # Imported here: only the render stage needs pygame
+    from render import Renderer
+
+    pygame.init()
+    try:
+        screen = pygame.display.set_mode((config.SCREEN_WIDTH, config.SCREEN_HEIGHT))
+        renderer = Renderer(screen, pygame.font.SysFont(None, 24), config)
+        renderer.draw(store, store.x, store.y, config.COLOR)  # Warm the label and sprite caches
+        start = time.perf_counter()
+        for _ in range(frames):
+            renderer.invalidate()
+            renderer.draw(store, store.x, store.y, config.COLOR)
+        return (time.perf_counter() - start) / frames
+    finally:
+        pygame.quit()
+
+
+def run_case(scene, mode, min_time=2.0, max_steps=1000, render=True, memory=True):
+    """Benchmark one scene and gravity mode; returns a JSON-friendly dict."""
+    start = time.perf_counter()
+    store, config = build(scene, mode)
+    build_time = time.perf_counter() - start
+    bodies = len(store)
+
+    simulation = TimedSimulation(store, config)
+    simulation.step()  # Warm-up: first-call allocations and imports are not timed
+    simulation.collide_time = simulation.gravity_time = 0.0
+    simulation.candidate_pairs = simulation.body_force_evaluations = 0
+    warm_steps = simulation.steps
+
+    start = time.perf_counter()
+    while True:  # At least one timed step
+        simulation.step()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or simulation.steps - warm_steps >= max_steps:
+            break
+    steps = simulation.steps - warm_steps
+
+    # Gravity pairs as a direct sum would count them, so modes can be compared
+    gravity_pairs = simulation.body_force_evaluations * max(len(store) - 1, 0)
+    return {
+        "scene": scene,
+        "gravity_mode": mode,
+        "bodies": bodies,
+        "black_holes": int(store.black_hole.sum()),
+        "bodies_after": len(store),
+        "steps": steps,
+        "build_s": build_time,
+        "step_s": elapsed / steps,
+        "gravity_s": simulation.gravity_time / steps,
+        "collision_s": simulation.collide_time / steps,
+        "integration_s": (elapsed - simulation.gravity_time - simulation.collide_time) / steps,
+        "steps_per_sec": steps / elapsed,
+        "gravity_pairs_per_sec": gravity_pairs / simulation.gravity_time if simulation.gravity_time else None,
+        "collision_pairs_per_sec": (simulation.candidate_pairs / simulation.collide_time
+                                    if simulation.collide_time else None),
+        "render_s": time_render(store, config) if render else None,
+        "peak_memory_bytes": peak_memory(scene, mode) if memory else None,
+    }
+
+
+def compare(results, previous):
+    """Print each stage's time relative to a previous run (above 1.0 is slower)."""
+    old = {(case["scene"], case["gravity_mode"]): case for case in previous["cases"]}
+    stages = ("step_s", "gravity_s", "collision_s", "integration_s", "render_s", "peak_memory_bytes")
+    print(f"{'case':<24}" + "".join(f"{stage:>18}" for stage in stages))
+    for case in results["cases"]:
+        before = old.get((case["scene"], case["gravity_mode"]))
+        if before is None:
+            continue
+        ratios = []
+        for stage in stages:
+            if case[stage] is None or not before.get(stage):
+                ratios.append(f"{'-':>18}")
+            else:
+                ratios.append(f"{case[stage] / before[stage]:>17.2f}x")
+        print(f"{case['scene'] + '/' + case['gravity_mode']:<24}" + "".join(ratios))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation stages on canonical seeded scenes.")
+    parser.add_argument("--scenes", nargs="+", choices=SCENES, default=list(SCENES))
+    parser.add_argument("--modes", nargs="+", help="Only run these gravity modes")
+    parser.add_argument("--min-time", type=float, default=2.0, help="Seconds of timed steps per case")
+    parser.add_argument("--max-steps", type=int, default=1000, help="Timed steps per case at most")
+    parser.add_argument("--no-render", action="store_true", help="Skip the render stage")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the peak memory pass")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Print stage ratios against a previous results file")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)  # Parse summaries would drown the results
+
+    results = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count(),
+            "seed": BENCH_SEED,
+        },
+        "cases": [],
+    }
+    for scene in args.scenes:
+        for mode in SCENES[scene][1]:
+            if args.modes and mode not in args.modes:
+                continue
+            case = run_case(scene, mode, args.min_time, args.max_steps, not args.no_render, not args.no_memory)
+            results["cases"].append(case)
+            print(f"{scene}/{mode}: {case['steps_per_sec']:.2f} steps/s, gravity {case['gravity_s'] * 1000:.2f} ms, "
+                  f"collisions {case['collision_s'] * 1000:.2f} ms, integration {case['integration_s'] * 1000:.2f} ms",
+                  file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import numpy as np
+
+from planet import Body, BLACK_HOLE_RADIUS, body_radius
+from settings import BLACK_HOLE_COLOR, SCREEN_WIDTH, SCREEN_HEIGHT
+
+
+def _column(name):
+    """Property exposing the live part [0, count) of a storage array; assignment writes into it."""
+    attr = "_" + name
+
+    def get(self):
+        return getattr(self, attr)[:self.count]
+
+    def set(self, value):
+        getattr(self, attr)[:self.count] = value
+
+    return property(get, set)
+
+
+class BodyStore:
+    """Structure-of-arrays store for every body in the simulation.
+
+    Each field is one contiguous array, so the physics stages run over whole arrays
+    instead of per-planet attribute lookups. Removal swaps the last body into the
+    freed slot (O(1)); removals requested during a step are batched and applied by
+    flush_removed() at the end of it, so indices stay valid for the whole step.
+    """
+
+    x = _column("x")
+    y = _column("y")
+    vx = _column("vx")
+    vy = _column("vy")
+    mass = _column("mass")
+    radius = _column("radius")
+    black_hole = _column("black_hole")
+    color = _column("color")
+    time = _column("time")
+    prev_x = _column("prev_x")
+    prev_y = _column("prev_y")
+    ax = _column("ax")
+    ay = _column("ay")
+    id = _column("id")
+
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.next_id = 0  # Ids are never reused, so an id follows one body through swap removals
+        self._allocate(max(capacity, 1))
+        self._pending = set()
+        self.accel_valid = False  # Whether ax/ay still match the current positions and masses
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self._x = np.zeros(capacity)
+        self._y = np.zeros(capacity)
+        self._vx = np.zeros(capacity)
+        self._vy = np.zeros(capacity)
+        self._mass = np.zeros(capacity)
+        self._radius = np.zeros(capacity)
+        self._black_hole = np.zeros(capacity, dtype=bool)
+        self._color = np.zeros((capacity, 3), dtype=np.uint8)
+        self._time = np.zeros(capacity)
+        # Positions before the last physics step, for interpolated rendering
+        self._prev_x = np.zeros(capacity)
+        self._prev_y = np.zeros(capacity)
+        # Accelerations at the current positions, reused by integrators between steps
+        self._ax = np.zeros(capacity)
+        self._ay = np.zeros(capacity)
+        # Stable identity of each body (its index changes when another body is removed)
+        self._id = np.zeros(capacity, dtype=np.int64)
+
+    def _reserve(self, needed):
+        """Grow every array (doubling) so that at least `needed` bodies fit."""
+        if needed <= self.capacity:
+            return
+        old = {name: getattr(self, name)[:self.count] for name in self._fields()}
+        self._allocate(max(needed, 2 * self.capacity))
+        for name, values in old.items():
+            getattr(self, name)[:self.count] = values
+
+    @staticmethod
+    def _fields():
+        return ("_x", "_y", "_vx", "_vy", "_mass", "_radius", "_black_hole", "_color", "_time",
+                "_prev_x", "_prev_y", "_ax", "_ay", "_id")
+
+    def __len__(self):
+        return self.count
+
+    def add(self, x, y, mass, color, vx, vy, black_hole=False):
+        """Append one body, with the same rules as Planet.__init__, and return its index."""
+        self._reserve(self.count + 1)
+        self.accel_valid = False
+        i = self.count
+        self.count += 1
+        self._x[i] = x
+        self._y[i] = y
+        self._mass[i] = mass
+        self._color[i] = BLACK_HOLE_COLOR if black_hole else color
+        self._radius[i] = BLACK_HOLE_RADIUS if black_hole else body_radius(mass)
+        self._vx[i] = 0 if black_hole else vx
+        self._vy[i] = 0 if black_hole else vy
+        self._black_hole[i] = black_hole
+        self._time[i] = 0
+        self._prev_x[i] = self._x[i]
+        self._prev_y[i] = self._y[i]
+        self._id[i] = self.next_id
+        self.next_id += 1
+        return i
+
+    def extend(self, x, y, mass, color, vx, vy, black_hole):
+        """Append many bodies at once from arrays, with the same rules as add()."""
+        n = len(x)
+        self._reserve(self.count + n)
+        self.accel_valid = False
+        s = slice(self.count, self.count + n)
+        black_hole = np.asarray(black_hole, dtype=bool)
+        self.count += n
+        self._x[s] = x
+        self._y[s] = y
+        self._mass[s] = mass
+        self._color[s] = np.where(black_hole[:, np.newaxis], BLACK_HOLE_COLOR, color)
+        self._radius[s] = np.where(black_hole, BLACK_HOLE_RADIUS, body_radius(np.asarray(mass, dtype=float)))
+        self._vx[s] = np.where(black_hole, 0, vx)
+        self._vy[s] = np.where(black_hole, 0, vy)
+        self._black_hole[s] = black_hole
+        self._time[s] = 0
+        self._prev_x[s] = self._x[s]
+        self._prev_y[s] = self._y[s]
+        self._id[s] = np.arange(self.next_id, self.next_id + n)
+        self.next_id += n
+
+    @classmethod
+    def from_arrays(cls, arrays, accel_valid=False):
+        """Build a store from the fields returned by arrays(), exactly as they were (no Planet rules applied)."""
+        n = len(arrays["x"])
+        store = cls(max(n, 64))
+        store.count = n
+        for name in cls._fields():
+            getattr(store, name)[:n] = arrays[name[1:]]
+        store.next_id = int(store.id.max()) + 1 if n else 0
+        store.accel_valid = accel_valid
+        return store
+
+    def copy_from(self, other):
+        """Make this store an exact copy of another, reusing its arrays when they are large enough."""
+        self._reserve(other.count)
+        self.count = other.count
+        for name in self._fields():
+            getattr(self, name)[:self.count] = getattr(other, name)[:other.count]
+        self.next_id = other.next_id
+        self.accel_valid = other.accel_valid
+
+    def swap_remove(self, i):
+        """Remove body i in O(1) by moving the last body into its slot."""
+        last = self.count - 1
+        self.accel_valid = False
+        if i != last:
+            for name in self._fields():
+                array = getattr(self, name)
+                array[i] = array[last]
+        self.count = last
+
+    def mark_removed(self, i):
+        """Schedule body i for removal at the end of the step."""
+        self._pending.add(i)
+
+    def is_removed(self, i):
+        return i in self._pending
+
+    def flush_removed(self):
+        """Apply every removal scheduled this step; returns how many bodies were removed."""
+        # Highest index first, so the body swapped into a freed slot is never one still pending
+        for i in sorted(self._pending, reverse=True):
+            self.swap_remove(i)
+        removed = len(self._pending)
+        self._pending.clear()
+        return removed
+
+    def drift(self, h=1.0):
+        """Move every body by its velocity over a step of length h."""
+        n = self.count
+        self._x[:n] += self._vx[:n] * h
+        self._y[:n] += self._vy[:n] * h
+
+    def clamp(self):
+        """Keep every body within screen bounds."""
+        n = self.count
+        np.clip(self._x[:n], 0, SCREEN_WIDTH, out=self._x[:n])
+        np.clip(self._y[:n], 0, SCREEN_HEIGHT, out=self._y[:n])
+
+    def save_previous(self):
+        """Remember the current positions as the start of the next physics step."""
+        n = self.count
+        self._prev_x[:n] = self._x[:n]
+        self._prev_y[:n] = self._y[:n]
+
+    def interpolated(self, alpha):
+        """Positions blended between the previous and current physics step (alpha in [0, 1])."""
+        return self.prev_x + (self.x - self.prev_x) * alpha, self.prev_y + (self.y - self.prev_y) * alpha
+
+    def arrays(self):
+        """Copies of every live field keyed by name, e.g. for np.savez."""
+        return {name[1:]: getattr(self, name)[:self.count].copy() for name in self._fields()}
+
+    def view(self, i):
+        return PlanetView(self, i)
+
+    def views(self):
+        """Lightweight Planet-like views of every live body, for drawing and scripting."""
+        return [PlanetView(self, i) for i in range(self.count)]
+
+
+def _field(name):
+    """Property reading and writing one element of a BodyStore array."""
+    attr = "_" + name
+
+    def get(self):
+        return getattr(self.store, attr)[self.index].item()
+
+    def set(self, value):
+        getattr(self.store, attr)[self.index] = value
+
+    return property(get, set)
+
+
+class PlanetView(Body):
+    """Planet-compatible view of one body in a BodyStore; reads and writes go to the arrays."""
+    __slots__ = ("store", "index")
+
+    x = _field("x")
+    y = _field("y")
+    vx = _field("vx")
+    vy = _field("vy")
+    mass = _field("mass")
+    radius = _field("radius")
+    black_hole = _field("black_hole")
+    time = _field("time")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def color(self):
+        return tuple(self.store._color[self.index].tolist())
+
+    @color.setter
+    def color(self, value):
+        self.store._color[self.index] = value
@@ -0,0 +1,44 @@
+"""Runtime configuration: the settings.py defaults with a build file's settings on top.
+
+The simulation and render stages take a Config instead of reading settings at
+import time, so several configurations (e.g. a parameter sweep) can run in one
+process without rewriting settings.py or re-importing modules.
+"""
+import copy
+
+import settings
+
+
+class Config:
+    """Every upper-case settings.py constant as an attribute, e.g. config.G or config.TIME_STEP."""
+
+    def __init__(self, **overrides):
+        for name in dir(settings):
+            if name.isupper():
+                setattr(self, name, getattr(settings, name))
+        self.update(**overrides)
+
+    def update(self, **overrides):
+        for name, value in overrides.items():
+            if not hasattr(self, name):
+                raise ValueError(f"Unknown setting: {name}")
+            setattr(self, name, value)
+
+    def replace(self, **overrides):
+        """Copy of this configuration with some settings changed."""
+        config = copy.copy(self)
+        config.update(**overrides)
+        return config
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        return f"Config({', '.join(f'{name}={value!r}' for name, value in vars(self).items())})"
+
+    @classmethod
+    def load(cls, build_file, **overrides):
+        """(BodyStore, Config) of a build file: its settings over the defaults, then the overrides."""
+        from scene_cache import load_scene  # Imported here: the scene cache pulls in the parser
+        store, scene_settings = load_scene(build_file)
+        return store, cls(**{**scene_settings, **overrides})
@@ -0,0 +1,98 @@
+"""Conserved-quantity diagnostics: total energy, linear momentum and angular momentum over time.
+
+Every DIAGNOSTICS_EVERY steps the simulation samples its state after the
+collisions and before the integrator moves anything. Kinetic energy, momentum
+and angular momentum (about the screen center) are vectorized sums over the
+bodies. Potential energy comes from a gravity evaluation at exactly the sampled
+positions: the simulation asks the gravity stage for the potential alongside
+the accelerations, so no second pairwise pass is needed unless no such
+evaluation happened (see Simulation.step).
+
+Energies use the units of Simulation.summary() (TJ) and include the TIME_STEP
+scaling of the gravity kick, so for a collision-free scene they are conserved
+up to the integrator's error. Drift is measured against the first sample (or the
+last reset()); merges, inelastic bounces, absorptions, screen-edge clamping and
+the fixed black holes change these quantities legitimately.
+"""
+import numpy as np
+
+from physics import KE_CONVERSION
+from planet import MASS_UNIT
+from settings import DIAGNOSTICS_EVERY, DRIFT_THRESHOLD, SCREEN_WIDTH, SCREEN_HEIGHT
+
+SAMPLE_DTYPE = np.dtype([("step", "i8"), ("bodies", "i8"), ("kinetic", "f8"), ("potential", "f8"), ("energy", "f8"),
+                         ("px", "f8"), ("py", "f8"), ("angular", "f8"), ("energy_drift", "f8"),
+                         ("momentum_drift", "f8"), ("angular_drift", "f8"), ("potential_reused", "?")])
+
+
+def _drift(value, baseline, scale):
+    return float(abs(value - baseline) / scale) if scale > 0 else 0.0
+
+
+class Diagnostics:
+    def __init__(self, every=DIAGNOSTICS_EVERY, threshold=DRIFT_THRESHOLD,
+                 origin=(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2)):
+        self.every = max(int(every), 1)
+        self.threshold = threshold  # Relative drift that raises the alarm
+        self.origin = origin
+        self.alarm = False  # Whether the latest sample drifted past the threshold
+        self.alarms = 0  # Times the alarm was raised
+        self._samples = []
+        self._baseline = None
+
+    def due(self, step):
+        return step % self.every == 0
+
+    def reset(self):
+        """Measure drift from the next sample on (e.g. after a deliberate change to the scene)."""
+        self._baseline = None
+        self.alarm = False
+
+    def record(self, step, x, y, vx, vy, mass, phi, time_step, reused=True):
+        """Add a sample of the bodies' state; phi is the gravitational potential of each body.
+
+        Returns True if this sample raised the alarm.
+        """
+        m = mass * MASS_UNIT
+        kinetic = 0.5 * float(np.dot(m, vx * vx + vy * vy)) / KE_CONVERSION
+        # Every pair appears in two bodies' potentials
+        potential = 0.5 * float(np.dot(m, phi)) * time_step / KE_CONVERSION
+        px, py = float(np.dot(mass, vx)), float(np.dot(mass, vy))
+        rx, ry = x - self.origin[0], y - self.origin[1]
+        angular = float(np.dot(mass, rx * vy - ry * vx))
+
+        if self._baseline is None:
+            # Drift scales: the baseline energy and the momenta summed without cancellation
+            speed = np.hypot(vx, vy)
+            self._baseline = (kinetic + potential, abs(kinetic + potential), px, py, float(np.dot(mass, speed)),
+                              angular, float(np.dot(mass, np.hypot(rx, ry) * speed)))
+        energy0, energy_scale, px0, py0, momentum_scale, angular0, angular_scale = self._baseline
+
+        energy = kinetic + potential
+        sample = (step, len(x), kinetic, potential, energy, px, py, angular,
+                  _drift(energy, energy0, energy_scale),
+                  float(np.hypot(px - px0, py - py0) / momentum_scale) if momentum_scale > 0 else 0.0,
+                  _drift(angular, angular0, angular_scale), reused)
+        self._samples.append(sample)
+
+        alarm = max(sample[8:11]) > self.threshold
+        raised = alarm and not self.alarm
+        self.alarm = alarm
+        self.alarms += raised
+        return raised
+
+    def series(self):
+        """Every sample so far, as a SAMPLE_DTYPE array (a time series of each quantity and its drift)."""
+        return np.array(self._samples, dtype=SAMPLE_DTYPE)
+
+    def latest(self):
+        """The last sample as plain JSON-friendly values, or None before the first."""
+        if not self._samples:
+            return None
+        return {name: value.item() if hasattr(value, "item") else value
+                for name, value in zip(SAMPLE_DTYPE.names, self._samples[-1])}
+
+    def export(self, path):
+        """Write the time series as CSV."""
+        np.savetxt(path, self.series(), delimiter=",", header=",".join(SAMPLE_DTYPE.names), comments="",
+                   fmt=["%d", "%d"] + ["%.17g"] * 9 + ["%d"])
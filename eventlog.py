@@ -0,0 +1,211 @@
+"""Buffered, structured event log.
+
+Text events (pause, background color, diagnostics) are filtered by a level per
+category, rate limited per category and written to the stream in one call per
+flush() instead of one print per line.
+
+Collision, absorption and state records go into a fixed-size binary ring buffer
+of RECORD_DTYPE rows. A background thread appends new rows to the event file, so
+an event costs a few array stores however busy the simulation gets. If the
+writer falls behind, the oldest unwritten rows are overwritten and counted in
+`dropped`. Read a file back with read_events(path).
+"""
+import logging
+import sys
+import threading
+import time
+
+import numpy as np
+
+from settings import LOG_LEVEL, LOG_RATE, LOG_STATE_EVERY
+
+DEBUG, INFO, WARNING, ERROR = logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR
+OFF = logging.CRITICAL + 10
+
+# Binary record kinds
+COLLISION = 1  # i, j: the two planets; value, value2: total KE before and after (TJ)
+ABSORPTION = 2  # i: absorbed planet, j: black hole; mass: absorbed mass
+STATE = 3  # i: body index; position, velocity and mass
+
+RECORD_DTYPE = np.dtype([("kind", "u1"), ("step", "i8"), ("i", "i8"), ("j", "i8"), ("x", "f8"), ("y", "f8"),
+                         ("vx", "f8"), ("vy", "f8"), ("mass", "f8"), ("value", "f8"), ("value2", "f8")])
+
+RING_CAPACITY = 1 << 16  # Records
+FLUSH_INTERVAL = 0.5  # Seconds between background writes
+
+
+def _level(level):
+    return level if isinstance(level, int) else logging.getLevelName(level.upper())
+
+
+def read_events(path):
+    """Every record of an event file, as a RECORD_DTYPE array."""
+    return np.fromfile(path, dtype=RECORD_DTYPE)
+
+
+class EventLog:
+    def __init__(self, level=LOG_LEVEL, levels=None, rate=LOG_RATE, state_every=LOG_STATE_EVERY, path=None,
+                 capacity=RING_CAPACITY, stream=None, enabled=True):
+        self.level = _level(level) if enabled else OFF
+        self.levels = {category: _level(value) for category, value in (levels or {}).items()} if enabled else {}
+        self.rate = rate  # Text events per second per category (also the burst size)
+        self.state_every = max(int(state_every), 1)
+        self.stream = sys.stdout if stream is None else stream
+        self.step = 0  # Simulation step stamped on binary records; set by the simulation
+
+        self._lines = []
+        self._tokens = {}  # category -> (tokens, last refill time)
+        self.suppressed = {}  # category -> rate-limited text events since the last flush
+        self._state_calls = 0
+
+        self._ring = np.zeros(capacity, dtype=RECORD_DTYPE)
+        self._head = 0  # Records ever written
+        self._tail = 0  # Records ever written out (or skipped)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+        self._file = None
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = False
+        if path and enabled:
+            self._file = open(path, "wb")
+            self._thread = threading.Thread(target=self._write_loop, name="event-log-writer", daemon=True)
+            self._thread.start()
+
+    @classmethod
+    def from_config(cls, config, **options):
+        return cls(config.LOG_LEVEL, config.LOG_LEVELS, config.LOG_RATE, config.LOG_STATE_EVERY,
+                   config.EVENT_LOG_FILE, enabled=config.LOG_TOGGLE, **options)
+
+    def enabled_for(self, category, level):
+        return level >= self.levels.get(category, self.level)
+
+    # Text events
+
+    def log(self, category, level, message):
+        if level < self.levels.get(category, self.level):
+            return
+        now = time.monotonic()
+        tokens, last = self._tokens.get(category, (self.rate, now))
+        tokens = min(self.rate, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._tokens[category] = (tokens, now)
+            self.suppressed[category] = self.suppressed.get(category, 0) + 1
+            return
+        self._tokens[category] = (tokens - 1, now)
+        self._lines.append(f"[{category}] {message}\n")
+
+    def debug(self, category, message):
+        self.log(category, DEBUG, message)
+
+    def info(self, category, message):
+        self.log(category, INFO, message)
+
+    def warning(self, category, message):
+        self.log(category, WARNING, message)
+
+    # Binary records
+
+    def _reserve(self, n):
+        """Ring slots for n new records; returns the absolute index of the first. Call with the lock held."""
+        capacity = len(self._ring)
+        start = self._head
+        self._head += n
+        if self._file is None:
+            self._tail = self._head  # Nothing to write out; the ring only keeps the latest records
+        elif self._head - self._tail > capacity:
+            overrun = self._head - self._tail - capacity
+            self.dropped += overrun
+            self._tail += overrun
+        return start
+
+    def _record(self, kind, i, j, x, y, vx=0.0, vy=0.0, mass=0.0, value=0.0, value2=0.0):
+        with self._lock:
+            self._ring[self._reserve(1) % len(self._ring)] = (kind, self.step, i, j, x, y, vx, vy, mass, value,
+                                                              value2)
+
+    def collision(self, i, j, x, y, ke_before, ke_after):
+        if self.enabled_for("collision", INFO):
+            self._record(COLLISION, i, j, x, y, value=ke_before, value2=ke_after)
+
+    def absorption(self, i, j, x, y, mass):
+        if self.enabled_for("absorption", INFO):
+            self._record(ABSORPTION, i, j, x, y, mass=mass)
+
+    def state(self, store):
+        """Dump every body's state, sampled: only every state_every-th call records anything."""
+        if not self.enabled_for("state", INFO):
+            return
+        self._state_calls += 1
+        if (self._state_calls - 1) % self.state_every:
+            return
+
+        capacity = len(self._ring)
+        n = len(store)
+        skip = max(n - capacity, 0)  # A dump larger than the ring keeps its last bodies
+        rows = np.zeros(n - skip, dtype=RECORD_DTYPE)
+        rows["kind"] = STATE
+        rows["step"] = self.step
+        rows["i"] = np.arange(skip, n)
+        rows["j"] = -1
+        for name in ("x", "y", "vx", "vy", "mass"):
+            rows[name] = getattr(store, name)[skip:]
+
+        with self._lock:
+            if skip:
+                self.dropped += skip
+            start = self._reserve(len(rows)) % capacity
+            first = min(len(rows), capacity - start)
+            self._ring[start:start + first] = rows[:first]
+            self._ring[:len(rows) - first] = rows[first:]
+
+    def records(self):
+        """The records still held in the ring, oldest first."""
+        with self._lock:
+            count = min(self._head, len(self._ring))
+            order = np.arange(self._head - count, self._head) % len(self._ring)
+            return self._ring[order]
+
+    # Output
+
+    def _drain(self):
+        with self._lock:
+            capacity = len(self._ring)
+            order = np.arange(self._tail, self._head) % capacity
+            pending = self._ring[order]
+            self._tail = self._head
+        if len(pending) and self._file is not None:
+            self._file.write(pending.tobytes())
+            self._file.flush()
+
+    def _write_loop(self):
+        while not self._stop:
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            self._drain()
+
+    def flush(self):
+        """Write buffered text in one call and wake the binary writer."""
+        # Swapped out rather than cleared, so events logged by another thread meanwhile are kept
+        lines, self._lines = self._lines, []
+        suppressed, self.suppressed = self.suppressed, {}
+        for category, count in suppressed.items():
+            if count:
+                lines.append(f"[{category}] {count} messages suppressed by rate limiting\n")
+        if lines:
+            self.stream.write("".join(lines))
+            self.stream.flush()
+        self._wake.set()
+
+    def close(self):
+        self.flush()
+        if self._thread is not None:
+            self._stop = True
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        if self._file is not None:
+            self._drain()
+            self._file.close()
+            self._file = None
@@ -0,0 +1,362 @@
+"""Flant, the build.txt scene language: tokenizer, parser and typed scene IR.
+
+    # comment
+    g = 0.5                               setting: name = number, word or tuple
+    p(x, y, mass, (r, g, b), vx, vy)      planet
+    b(x, y, mass)                         black hole
+    r(count, random_velocity, max_mass)   random planets
+    sr(count, random_velocity, max_mass, pos_seed, mass_seed)
+
+Nothing is evaluated: values are numeric literals, bare words (gravity = numpy)
+and parenthesized tuples. Every error carries its line number, and a bad line is
+skipped without stopping the parse.
+
+Generated scenes are mostly p() and b() lines, so those are validated and
+converted for the whole file at once on the raw bytes (per-line comma and
+parenthesis counts, a character whitelist, one numpy.fromstring call). Lines
+that do not pass the bulk checks go through the tokenizer and parser below,
+which either accepts them or reports exactly what is wrong.
+"""
+import re
+import warnings
+from typing import NamedTuple
+
+import numpy as np
+
+
+class FlantError(ValueError):
+    def __init__(self, line, message):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+        self.message = message
+
+
+class Setting(NamedTuple):
+    """name = value"""
+    name: str
+    value: object  # int, float, str (bare word) or tuple
+    line: int
+
+
+class Bodies(NamedTuple):
+    """Consecutive p() and b() statements, one array element per body, in file order."""
+    x: np.ndarray
+    y: np.ndarray
+    mass: np.ndarray
+    color: np.ndarray  # (n, 3) uint8
+    vx: np.ndarray
+    vy: np.ndarray
+    black_hole: np.ndarray
+    line: np.ndarray
+
+
+class RandomBodies(NamedTuple):
+    """r() or sr(); pos_seed and mass_seed are None for r()."""
+    directive: str
+    count: int
+    random_velocity: bool
+    max_mass: int
+    pos_seed: object
+    mass_seed: object
+    line: int
+
+
+class Scene(NamedTuple):
+    settings: list  # Setting, in file order
+    bodies: list  # Bodies and RandomBodies, in file order
+    errors: list  # FlantError, in line order
+
+
+# ---------------------------------------------------------------------------
+# Tokenizer and parser (one statement per line)
+
+_TOKEN = re.compile(r"""\s*(?:
+      (?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+    | (?P<name>[A-Za-z_]\w*)
+    | (?P<punct>[(),=])
+    | (?P<comment>\#.*)
+    | (?P<error>\S)
+    )""", re.VERBOSE)
+
+# Argument kinds of each body directive: "number", "integer" or "color"
+_SIGNATURES = {
+    "p": ("number", "number", "number", "color", "number", "number"),
+    "b": ("number", "number", "number"),
+    "r": ("integer", "number", "integer"),
+    "sr": ("integer", "number", "integer", "integer", "integer"),
+}
+
+
+def tokenize(text, line=1):
+    """List of (kind, value) tokens of one line; kind is "number", "name" or the punctuation itself."""
+    tokens = []
+    position = 0
+    end = len(text.rstrip())
+    while position < end:
+        match = _TOKEN.match(text, position)
+        kind = match.lastgroup
+        value = match.group(kind)
+        position = match.end()
+        if kind == "comment":
+            break
+        if kind == "error":
+            raise FlantError(line, f"unexpected character {value!r}")
+        if kind == "number":
+            tokens.append((kind, float(value) if any(c in value for c in ".eE") else int(value)))
+        elif kind == "punct":
+            tokens.append((value, value))
+        else:
+            tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens, line):
+        self.tokens = tokens
+        self.position = 0
+        self.line = line
+
+    def peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else "end of line"
+
+    def expect(self, kind):
+        if self.peek() != kind:
+            raise FlantError(self.line, f"expected {kind!r}, found {self.peek()!r}")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token[1]
+
+    def value(self):
+        kind = self.peek()
+        if kind in ("number", "name"):
+            return self.expect(kind)
+        if kind == "(":
+            return tuple(self.arguments())
+        raise FlantError(self.line, f"expected a value, found {kind!r}")
+
+    def arguments(self):
+        self.expect("(")
+        values = [self.value()]
+        while self.peek() == ",":
+            self.expect(",")
+            values.append(self.value())
+        self.expect(")")
+        return values
+
+    def statement(self):
+        name = self.expect("name")
+        if self.peek() == "=":
+            self.expect("=")
+            result = Setting(name, self.value(), self.line)
+        elif self.peek() == "(":
+            result = self.directive(name, self.arguments())
+        else:
+            raise FlantError(self.line, f"expected '=' or '(' after {name!r}")
+        if self.position != len(self.tokens):
+            raise FlantError(self.line, f"unexpected {self.peek()!r} after the statement")
+        return result
+
+    def directive(self, name, values):
+        signature = _SIGNATURES.get(name)
+        if signature is None:
+            raise FlantError(self.line, f"unknown directive {name}()")
+        if len(values) != len(signature):
+            raise FlantError(self.line, f"{name}() takes {len(signature)} arguments, got {len(values)}")
+        for index, (kind, value) in enumerate(zip(signature, values), 1):
+            if kind == "color":
+                if not (isinstance(value, tuple) and len(value) == 3 and all(_is_channel(c) for c in value)):
+                    raise FlantError(self.line, f"argument {index} of {name}() must be an (r, g, b) color "
+                                                f"with channels 0-255, got {value!r}")
+            elif not isinstance(value, (int, float)) or (kind == "integer" and not float(value).is_integer()):
+                expected = "an integer" if kind == "integer" else "a number"
+                raise FlantError(self.line, f"argument {index} of {name}() must be {expected}, got {value!r}")
+        return name, values
+
+
+def _is_channel(value):
+    return isinstance(value, (int, float)) and float(value).is_integer() and 0 <= value <= 255
+
+
+def parse_statement(text, line=1):
+    """Parse one non-empty, non-comment line into a Setting or (directive name, argument list)."""
+    tokens = tokenize(text, line)
+    return _Parser(tokens, line).statement()
+
+
+# ---------------------------------------------------------------------------
+# Bulk path for p() and b() lines
+
+_ALLOWED = np.zeros(256, dtype=bool)
+_ALLOWED[np.frombuffer(b"0123456789+-.eE \t,()\n", dtype=np.uint8)] = True
+
+# Characters turned into separators or blanks before numpy.fromstring
+_BLANKS = bytes.maketrans(b"pb()\n", b"    ,")
+
+
+def _bulk_lines(data, starts, ends, letter, commas, opens_commas, closes_commas, per_line):
+    """Mask of the lines that are exactly letter(...) with the given comma layout (bytes-level checks)."""
+    length = ends - starts
+    nonempty = length >= 3
+    first = np.where(nonempty, data[np.minimum(starts, len(data) - 1)], 0)
+    second = np.where(nonempty, data[np.minimum(starts + 1, len(data) - 1)], 0)
+    last = np.where(nonempty, data[np.maximum(ends - 1, 0)], 0)
+    return (nonempty & (first == ord(letter)) & (second == ord("(")) & (last == ord(")"))
+            & (per_line["bad"] == 1) & (per_line["commas"] == commas)
+            & (per_line["opens"] == len(opens_commas)) & (per_line["closes"] == len(closes_commas))
+            & (per_line["opens_commas"] == sum(opens_commas)) & (per_line["closes_commas"] == sum(closes_commas)))
+
+
+def _convert(text, count, width):
+    """numpy.fromstring of `count` blanked lines into a (count, width) array, or None if any value is bad."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        try:
+            values = np.fromstring(text, sep=",")
+        except (ValueError, DeprecationWarning):
+            return None
+    if len(values) != width * count:
+        return None
+    return values.reshape(-1, width)
+
+
+def _bulk_values(data, lengths, mask, width):
+    """Convert the selected lines (with letter and parentheses blanked) into an (n, width) array.
+
+    Lines numpy cannot convert are cleared from `mask`, for the slow path to report.
+    A block that fails is bisected, so the other lines around a bad one stay on the bulk path.
+    """
+    keep = np.repeat(mask, lengths + 1)[:len(data)]
+    text = data[keep].tobytes().translate(_BLANKS)
+    lines = np.flatnonzero(mask)
+    # Each selected line's span in the blanked text, newline (now a comma) included
+    bounds = np.minimum(np.concatenate(([0], np.cumsum(lengths[lines] + 1))), len(text)).tolist()
+
+    blocks = []
+    pending = [(0, len(lines))] if len(lines) else []
+    while pending:
+        lo, hi = pending.pop()
+        values = _convert(text[bounds[lo]:bounds[hi]], hi - lo, width)
+        if values is not None:
+            blocks.append(values)
+        elif hi - lo == 1:
+            mask[lines[lo]] = False
+        else:
+            mid = (lo + hi) // 2
+            pending += [(mid, hi), (lo, mid)]  # Lower half first, so the blocks stay in line order
+    return np.concatenate(blocks) if blocks else np.zeros((0, width))
+
+
+def _scan(data):
+    """Classify every line of the raw bytes; returns line bounds and the p() and b() bulk masks."""
+    newlines = np.flatnonzero(data == ord("\n"))
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(data)]))
+
+    # Disallowed characters per line; each segment runs up to the next line start, newline included
+    bad = np.add.reduceat(~_ALLOWED[data], np.minimum(starts, len(data) - 1), dtype=np.int32)
+    bad[ends == starts] = 0
+
+    comma_total = np.concatenate(([0], np.cumsum(data == ord(","), dtype=np.int32)))
+    per_line = {"bad": bad, "commas": comma_total[ends] - comma_total[starts]}
+    for name, char in (("opens", "("), ("closes", ")")):
+        positions = np.flatnonzero(data == ord(char))
+        owners = np.searchsorted(starts, positions, side="right") - 1
+        per_line[name] = np.bincount(owners, minlength=len(starts))
+        # Commas before each parenthesis within its line, summed per line, pins down the nesting layout
+        before = comma_total[positions] - comma_total[starts[owners]]
+        per_line[name + "_commas"] = np.bincount(owners, weights=before, minlength=len(starts)).astype(np.int64)
+
+    planets = _bulk_lines(data, starts, ends, "p", 7, (0, 3), (5, 7), per_line)
+    black_holes = _bulk_lines(data, starts, ends, "b", 2, (0,), (2,), per_line)
+    return starts, ends, planets, black_holes
+
+
+# ---------------------------------------------------------------------------
+# Scene assembly
+
+def parse(text):
+    """Parse build file text into a Scene."""
+    data = np.frombuffer((text or "\n").encode(), dtype=np.uint8)
+    starts, ends, bulk_planets, bulk_black_holes = _scan(data)
+    lengths = ends - starts
+    line_numbers = np.arange(1, len(starts) + 1)
+
+    rows = []  # (line numbers, (n, 8) array of x, y, mass, r, g, b, vx, vy, black hole flags)
+    # Lines with something the byte checks let through drop out of the masks and are parsed one by one
+    planet_values = _bulk_values(data, lengths, bulk_planets, 8)
+    rows.append((line_numbers[bulk_planets], planet_values, np.zeros(len(planet_values), dtype=bool)))
+
+    black_hole_values = _bulk_values(data, lengths, bulk_black_holes, 3)
+    values = np.zeros((len(black_hole_values), 8))
+    values[:, :3] = black_hole_values
+    rows.append((line_numbers[bulk_black_holes], values, np.ones(len(values), dtype=bool)))
+
+    settings = []
+    randoms = []
+    errors = []
+    slow_rows = []
+    slow_lines = []
+    slow_black_holes = []
+    remaining = np.flatnonzero(~(bulk_planets | bulk_black_holes) & (lengths > 0))
+    for index in remaining.tolist():
+        line = index + 1
+        source = data[starts[index]:ends[index]].tobytes().decode("utf-8", errors="replace").strip()
+        if not source or source.startswith("#"):
+            continue
+        try:
+            statement = parse_statement(source, line)
+        except FlantError as error:
+            errors.append(error)
+            continue
+
+        if isinstance(statement, Setting):
+            settings.append(statement)
+            continue
+        name, values = statement
+        if name == "p":
+            x, y, mass, color, vx, vy = values
+            slow_rows.append((x, y, mass, *color, vx, vy))
+            slow_lines.append(line)
+            slow_black_holes.append(False)
+        elif name == "b":
+            x, y, mass = values
+            slow_rows.append((x, y, mass, 0, 0, 0, 0, 0))
+            slow_lines.append(line)
+            slow_black_holes.append(True)
+        else:
+            count, random_velocity, max_mass = int(values[0]), bool(values[1]), int(values[2])
+            seeds = (int(values[3]), int(values[4])) if name == "sr" else (None, None)
+            randoms.append(RandomBodies(name, count, random_velocity, max_mass, *seeds, line))
+
+    if slow_rows:
+        rows.append((np.array(slow_lines), np.array(slow_rows, dtype=float).reshape(-1, 8),
+                     np.array(slow_black_holes, dtype=bool)))
+
+    # Colors that came through the bulk path still have to be valid channels
+    lines = np.concatenate([r[0] for r in rows]) if rows else np.zeros(0, dtype=np.int64)
+    values = np.concatenate([r[1] for r in rows]) if rows else np.zeros((0, 8))
+    black_hole = np.concatenate([r[2] for r in rows]) if rows else np.zeros(0, dtype=bool)
+    color = values[:, 3:6]
+    bad_color = ~black_hole & ((color < 0) | (color > 255) | (color != np.floor(color))).any(axis=1)
+    for line, bad in zip(lines[bad_color].tolist(), color[bad_color].tolist()):
+        errors.append(FlantError(line, f"argument 4 of p() must be an (r, g, b) color with channels 0-255, "
+                                       f"got ({', '.join(f'{c:g}' for c in bad)})"))
+    keep = ~bad_color
+    order = np.argsort(lines[keep], kind="stable")
+    lines, values, black_hole = lines[keep][order], values[keep][order], black_hole[keep][order]
+
+    # Random directives split the body rows into batches, keeping everything in file order
+    bodies = []
+    start = 0
+    for directive in randoms + [None]:
+        stop = len(lines) if directive is None else int(np.searchsorted(lines, directive.line))
+        if stop > start:
+            batch = values[start:stop]
+            bodies.append(Bodies(batch[:, 0], batch[:, 1], batch[:, 2], batch[:, 3:6].astype(np.uint8),
+                                 batch[:, 6], batch[:, 7], black_hole[start:stop], lines[start:stop]))
+        if directive is not None:
+            bodies.append(directive)
+        start = stop
+
+    errors.sort(key=lambda error: error.line)
+    return Scene(settings, bodies, errors)
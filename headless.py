@@ -0,0 +1,107 @@
+"""Run a build file without a window, as fast as the CPU allows.
+
+    python headless.py build.txt --steps 1000 --output state.npz --summary summary.json --workers 32
+    python headless.py --resume part1.npz --steps 1000 --snapshot part2.npz
+    python headless.py build.txt --steps 1000 --trajectory run.traj --stride 10
+
+Nothing here imports pygame.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from config import Config
+from eventlog import EventLog
+from simulation import Simulation
+from snapshot import load_snapshot, restore_counters, save_snapshot
+from trajectory import TrajectoryRecorder
+
+
+def run(build_file, steps, output=None, summary_file=None, workers=None, resume_from=None, snapshot_file=None,
+        trajectory_file=None, stride=None, diagnostics_file=None, diagnostics_every=None):
+    """Load a build file, advance it `steps` times and write the final state and summary.
+
+    workers overrides the build file's worker count for the parallel gravity mode.
+    resume_from continues from a snapshot instead of the build file, and
+    snapshot_file saves one at the end, so a long run can be split into parts.
+    trajectory_file records every `stride`-th step (and the starting state) with a TrajectoryRecorder.
+    diagnostics_every overrides DIAGNOSTICS_EVERY, and diagnostics_file receives the energy and momentum
+    time series as CSV.
+    """
+    if resume_from:
+        snapshot = load_snapshot(resume_from)
+        store, config = snapshot.store, snapshot.config
+    else:
+        snapshot = None
+        store, config = Config.load(build_file)
+    if workers is not None:
+        config.update(WORKERS=workers)
+    if diagnostics_every is not None:
+        config.update(DIAGNOSTICS_EVERY=diagnostics_every)
+    events = EventLog.from_config(config)
+    simulation = Simulation(store, config, events)
+    if snapshot is not None:
+        restore_counters(simulation, snapshot.counters)
+
+    trajectory_file = trajectory_file or config.TRAJECTORY_FILE
+    recorder = None
+    if trajectory_file:
+        recorder = TrajectoryRecorder(trajectory_file, store, config.TRAJECTORY_STRIDE if stride is None else stride,
+                                      config.TRAJECTORY_DTYPE, config.TRAJECTORY_CHUNK)
+        recorder.record(store, simulation.steps)
+
+    start = time.perf_counter()
+    if recorder is None:
+        simulation.run(steps)
+    else:
+        for _ in range(steps):
+            simulation.step()
+            recorder.record(store, simulation.steps)
+    elapsed = time.perf_counter() - start
+    events.close()
+    if recorder is not None:
+        recorder.close()
+
+    summary = simulation.summary()
+    summary["wall_time_s"] = elapsed
+    summary["steps_per_sec"] = steps / elapsed if elapsed > 0 else None
+
+    if output:
+        np.savez(output, **store.arrays())
+    if snapshot_file:
+        save_snapshot(snapshot_file, simulation)
+    if diagnostics_file and simulation.diagnostics is not None:
+        simulation.diagnostics.export(diagnostics_file)
+    if summary_file:
+        with open(summary_file, "w") as file:
+            json.dump(summary, file, indent=2)
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a flanet scene headless.")
+    parser.add_argument("build_file", nargs="?", default="build.txt")
+    parser.add_argument("--steps", type=int, default=1000, help="Number of simulation steps to run")
+    parser.add_argument("--output", help="Write the final body arrays to this .npz file")
+    parser.add_argument("--summary", help="Write the summary statistics to this JSON file")
+    parser.add_argument("--workers", type=int,
+                        help="Processes for the parallel gravity mode (0 = every core); overrides build.txt")
+    parser.add_argument("--resume", help="Continue from this snapshot instead of the build file")
+    parser.add_argument("--snapshot", help="Save a snapshot of the final state to this file")
+    parser.add_argument("--trajectory", help="Record the trajectories to this file")
+    parser.add_argument("--stride", type=int, help="Record every n-th step; overrides the trajectory stride setting")
+    parser.add_argument("--diagnostics", type=int, metavar="N",
+                        help="Sample energy and momentum every N steps; overrides the build file")
+    parser.add_argument("--diagnostics-file", help="Write the energy and momentum time series to this CSV file")
+    args = parser.parse_args()
+
+    summary = run(args.build_file, args.steps, args.output, args.summary, args.workers, args.resume, args.snapshot,
+                  args.trajectory, args.stride, args.diagnostics_file, args.diagnostics)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
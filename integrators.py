@@ -0,0 +1,129 @@
+"""Time integrators for a BodyStore.
+
+Each integrator advances the system dx/dt = v, dv/dt = a(x) by one step of
+length h, where h is measured in the original one-step-per-frame units and
+`accelerations(x, y, targets=None)` returns a(x) already scaled by TIME_STEP.
+With h = 1, "euler" is exactly the original kick-then-drift update.
+"""
+import numpy as np
+
+from settings import ADAPTIVE_ETA, ADAPTIVE_MAX_LEVEL
+
+
+def euler(store, accelerations, h):
+    """Semi-implicit (symplectic) Euler: kick with a(x), then drift with the new velocity."""
+    ax, ay = accelerations(store.x, store.y)
+    store.vx += ax * h
+    store.vy += ay * h
+    store.drift(h)
+    store.clamp()
+    store.accel_valid = False
+
+
+def leapfrog(store, accelerations, h):
+    """Kick-drift-kick leapfrog (velocity Verlet), second order and symplectic.
+
+    The acceleration at the end of a step is kept on the store and reused at the start
+    of the next one, so each step costs a single force evaluation unless collisions or
+    removals moved bodies in between.
+    """
+    if not store.accel_valid:
+        store.ax, store.ay = accelerations(store.x, store.y)
+
+    store.vx += 0.5 * h * store.ax
+    store.vy += 0.5 * h * store.ay
+    store.drift(h)
+    store.clamp()
+
+    store.ax, store.ay = accelerations(store.x, store.y)
+    store.vx += 0.5 * h * store.ax
+    store.vy += 0.5 * h * store.ay
+    store.accel_valid = True
+
+
+def rk4(store, accelerations, h):
+    """Classic fourth-order Runge-Kutta on positions and velocities (four force evaluations)."""
+    x, y, vx, vy = store.x.copy(), store.y.copy(), store.vx.copy(), store.vy.copy()
+
+    k1ax, k1ay = accelerations(x, y)
+    k1x, k1y = vx, vy
+
+    k2x, k2y = vx + 0.5 * h * k1ax, vy + 0.5 * h * k1ay
+    k2ax, k2ay = accelerations(x + 0.5 * h * k1x, y + 0.5 * h * k1y)
+
+    k3x, k3y = vx + 0.5 * h * k2ax, vy + 0.5 * h * k2ay
+    k3ax, k3ay = accelerations(x + 0.5 * h * k2x, y + 0.5 * h * k2y)
+
+    k4x, k4y = vx + h * k3ax, vy + h * k3ay
+    k4ax, k4ay = accelerations(x + h * k3x, y + h * k3y)
+
+    store.x = x + h / 6 * (k1x + 2 * k2x + 2 * k3x + k4x)
+    store.y = y + h / 6 * (k1y + 2 * k2y + 2 * k3y + k4y)
+    store.vx = vx + h / 6 * (k1ax + 2 * k2ax + 2 * k3ax + k4ax)
+    store.vy = vy + h / 6 * (k1ay + 2 * k2ay + 2 * k3ay + k4ay)
+    store.clamp()
+    store.accel_valid = False
+
+
+def block_levels(store, h, eta=ADAPTIVE_ETA, max_level=ADAPTIVE_MAX_LEVEL):
+    """Power-of-two time step level of every body from its current acceleration.
+
+    A body at level k steps with h / 2**k, the largest such step for which its
+    acceleration moves it by at most eta * radius within one step.
+    """
+    accel = np.hypot(store.ax, store.ay)
+    with np.errstate(divide="ignore"):
+        wanted = np.sqrt(2 * eta * np.maximum(store.radius, 1.0) / accel)
+        levels = np.ceil(np.log2(h / wanted))
+    return np.clip(np.nan_to_num(levels, nan=0.0, neginf=0.0), 0, max_level).astype(np.int64)
+
+
+def adaptive(store, accelerations, h, eta=ADAPTIVE_ETA, max_level=ADAPTIVE_MAX_LEVEL):
+    """Block time steps: leapfrog where each body kicks on its own power-of-two sub-step.
+
+    All bodies drift together on the finest active sub-step, but forces are only
+    evaluated for the bodies whose own step ends there, so expensive small steps
+    are spent only on bodies with large accelerations (close encounters).
+    Returns the number of bodies at each level.
+    """
+    if not store.accel_valid:
+        store.ax, store.ay = accelerations(store.x, store.y)
+
+    levels = block_levels(store, h, eta, max_level)
+    finest = int(levels.max()) if len(levels) else 0
+    substeps = 1 << finest
+    dt_min = h / substeps
+    dt = h / (1 << levels)
+    stride = 1 << (finest - levels)  # Sub-steps spanned by one step of each body
+
+    for s in range(substeps):
+        # First half kick for bodies whose step starts now
+        starting = s % stride == 0
+        store.vx[starting] += 0.5 * dt[starting] * store.ax[starting]
+        store.vy[starting] += 0.5 * dt[starting] * store.ay[starting]
+
+        store.drift(dt_min)
+        store.clamp()
+
+        # New forces and second half kick for bodies whose step ends now
+        ending = np.flatnonzero((s + 1) % stride == 0)
+        ax, ay = accelerations(store.x, store.y, ending)
+        store.ax[ending] = ax
+        store.ay[ending] = ay
+        store.vx[ending] += 0.5 * dt[ending] * ax
+        store.vy[ending] += 0.5 * dt[ending] * ay
+
+    # Every body's step ends on the last sub-step, so all accelerations are current
+    store.accel_valid = True
+    return np.bincount(levels, minlength=max_level + 1)
+
+
+# Deepest adaptive level a build file may ask for: 2**16 sub-steps per step
+MAX_LEVEL_LIMIT = 16
+
+INTEGRATORS = {
+    "euler": euler,
+    "leapfrog": leapfrog,
+    "rk4": rk4,
+    "adaptive": adaptive,
+}
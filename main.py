@@ -1,149 +1,234 @@
+import time
+
 import pygame
 import psutil
-import settings
-
-from parse import parse_build_file
-from settings import SCREEN_WIDTH, SCREEN_HEIGHT, FPS, SCALE, WHITE, COLOR, TIME_STEP, G, LOG_TOGGLE, RGB_TOGGLE
-from planet import Planet
-from physics import apply_gravity, resolve_collision
-from utils import check_collision, distance
-
-CENTER_X = SCREEN_WIDTH / 2
-CENTER_Y = SCREEN_HEIGHT / 2
-
-# Parse the build.txt file and retrieve planet data
-planets_data = parse_build_file("build.txt")
-
-pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("2D Planet Simulator")
-clock = pygame.time.Clock()
-
-# Create a font for rendering text
-font = pygame.font.SysFont(None, 24)
-
-# Initialize the start_ticks variable for elapsed time calculation
-start_ticks = pygame.time.get_ticks()  # Get the current time in milliseconds
-paused_time = 0  # Track total time spent in pause mode
-pause_start_ticks = None  # Track when pause started
-
-# Initialize planets dynamically from the parsed build file
-planets = planets_data
-
-
-paused = False  # Pause state
-
-# Initial color
-bg_color = list(COLOR)  # Convert tuple to list
-
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE:
-                paused = not paused
-                if paused:
-                    pause_start_ticks = pygame.time.get_ticks()  # Start tracking pause time
-                    print("Simulation Paused")
-                else:
-                    # Update paused time and calculate total elapsed time when resumed
-                    paused_time += pygame.time.get_ticks() - pause_start_ticks
-                    print("Simulation Resumed")
-
-            # Adjust the background color using hotkeys
-            if event.key == pygame.K_r:  # Increase red value
-                bg_color[0] = (bg_color[0] + 10) % 256  # Reset to 0 if over 255
-                print(f"Updated background color: {bg_color}")
-            elif event.key == pygame.K_g:  # Increase green value
-                bg_color[1] = (bg_color[1] + 10) % 256  # Reset to 0 if over 255
-                print(f"Updated background color: {bg_color}")
-            elif event.key == pygame.K_b:  # Increase blue value
-                bg_color[2] = (bg_color[2] + 10) % 256  # Reset to 0 if over 255
-                print(f"Updated background color: {bg_color}")
-
-            # Increase all color values by 10 when W is pressed
-            elif event.key == pygame.K_w:
-                bg_color = [(c + 10) % 256 for c in bg_color]
-                print(f"Updated background color by 10 to: {bg_color}")
-
-            # Reset all color values to 0 when 0 key is pressed (Black background)
-            elif event.key == pygame.K_0:
-                bg_color = [0, 0, 0]
-                print(f"Reset background color to black: {bg_color}")
-
-            if event.key == pygame.K_i:
-                # Set velocity of all planets inward towards the center, excluding black holes
-                for planet in planets:
-                    if not planet.black_hole:  # Skip black holes
-                        dx = CENTER_X - planet.x
-                        dy = CENTER_Y - planet.y
-                        dist = distance(planet,
-                                        Planet(CENTER_X, CENTER_Y, 0, None, 0, 0))  # Use the utils distance function
-
-                        if dist > 0:  # Prevent division by zero if distance is zero
-                            norm_dx = dx / dist
-                            norm_dy = dy / dist
-                            planet.vx = norm_dx * 11  # Adjust speed here as needed
-                            planet.vy = norm_dy * 11  # Adjust speed here as needed
-
-            elif event.key == pygame.K_o:
-                # Set velocity of all planets outward from the center, excluding black holes
-                for planet in planets:
-                    if not planet.black_hole:  # Skip black holes
-                        dx = planet.x - CENTER_X
-                        dy = planet.y - CENTER_Y
-                        dist = distance(planet,
-                                        Planet(CENTER_X, CENTER_Y, 0, None, 0, 0))  # Use the utils distance function
-
-                        if dist > 0:  # Prevent division by zero if distance is zero
-                            norm_dx = dx / dist
-                            norm_dy = dy / dist
-                            planet.vx = norm_dx * 11  # Adjust speed here as needed
-                            planet.vy = norm_dy * 11  # Adjust speed here as needed
-
-    if not paused:
-        # Check collisions and resolve them
-        for i, p1 in enumerate(planets):
-            for j, p2 in enumerate(planets):
-                if i < j and check_collision(p1, p2):
-                    if LOG_TOGGLE:
-                        print(f"Collision detected between planet {i} and planet {j}!")
-                    resolve_collision(p1, p2, planets)
-
-        # Apply gravity between planets
-        for i, p1 in enumerate(planets):
-            for j, p2 in enumerate(planets):
-                if i != j:
-                    apply_gravity(p1, p2, TIME_STEP)
-
-        # Update planets' positions
-        for planet in planets:
-            planet.update()
-
-    # Clear screen and draw planets
-    screen.fill(bg_color)  # Use the dynamically updated background color
-    for planet in planets:
-        planet.draw(screen, font)  # Pass the font to the draw function
-
-    # Render timer text (Elapsed time, adjusted for pause), only if not paused
-    if not paused:
-        elapsed_time = (pygame.time.get_ticks() - start_ticks - paused_time) / 1000
-        timer_text = font.render(f"Time: {elapsed_time:.2f}s", True, WHITE)
-        screen.blit(timer_text, (SCREEN_WIDTH - 100, 10))
-
-    # Display RGB values only if RGB_TOGGLE is True
-    if RGB_TOGGLE:
-        rgb_text = font.render(f"RGB: {bg_color[0]}, {bg_color[1]}, {bg_color[2]}", True, WHITE)
-        screen.blit(rgb_text, (10, 10))
-
-    if LOG_TOGGLE:
-        for planet in planets:
-            print(
-                f"Planet - Pos: ({planet.x:.2f}, {planet.y:.2f}) | Vel: ({planet.vx:.2f}, {planet.vy:.2f}) | Mass: {planet.mass} | Color: {planet.color}")
-
-    pygame.display.flip()
-    clock.tick(FPS)
-
-pygame.quit()
\ No newline at end of file
+
+from config import Config
+from eventlog import EventLog
+from physics import barnes_hut_error
+from profiler import Profiler
+from simulation import Simulation
+from snapshot import save_snapshot, resume
+from render import Renderer
+from worker import SimulationWorker
+
+
+def main():
+    # Parse the build.txt file straight into the body arrays (or load it from the scene cache when unchanged);
+    # its settings override the settings.py defaults for this run
+    planets, config = Config.load("build.txt")
+
+    CENTER_X = config.SCREEN_WIDTH / 2
+    CENTER_Y = config.SCREEN_HEIGHT / 2
+
+    # Buffered text events and binary collision / absorption / state records, all off when LOG_TOGGLE is False
+    events = EventLog.from_config(config)
+
+    # Per-stage frame timings for the performance HUD (P toggles it, E exports the history)
+    profiler = Profiler(config.PROFILE_HISTORY, config.PROFILE_HUD)
+
+    simulation = Simulation(planets, config, events)
+
+    # Report how far the Barnes-Hut approximation is from the exact pairwise force on this scene
+    if config.GRAVITY_MODE == "barnes_hut":
+        rms_error, max_error = barnes_hut_error(planets, config.THETA)
+        events.info("simulation", f"Barnes-Hut (theta = {config.THETA}) force error vs exact: "
+                                  f"RMS {rms_error:.3%}, max {max_error:.3%}")
+
+    pygame.init()
+    screen = pygame.display.set_mode((config.SCREEN_WIDTH, config.SCREEN_HEIGHT))
+    pygame.display.set_caption("2D Planet Simulator")
+    clock = pygame.time.Clock()
+
+    # Create a font for rendering text
+    font = pygame.font.SysFont(None, 24)
+
+    # Label cache, black hole sprites, culling and dirty rectangles
+    renderer = Renderer(screen, font, config)
+
+    # Initialize the start_ticks variable for elapsed time calculation
+    start_ticks = pygame.time.get_ticks()  # Get the current time in milliseconds
+    paused_time = 0  # Track total time spent in pause mode
+    pause_start_ticks = None  # Track when pause started
+
+    paused = False  # Pause state
+
+    # Physics runs on its own thread at a fixed timestep; this loop handles input and draws the latest
+    # state it published. Everything that changes the simulation is sent to it as a command.
+    worker = SimulationWorker(simulation, events)
+    worker.time_stages(profiler.enabled)
+    worker.start()
+    frame_seconds = 0.0
+
+    # Initial color
+    bg_color = list(config.COLOR)  # Convert tuple to list
+
+    running = True
+    while running:
+        # Only a frame that starts with the profiler enabled is timed, and nothing at all is timed otherwise
+        timing = profiler.enabled
+        if timing:
+            stage_start = time.perf_counter()
+
+        redraw = not paused  # A paused frame is only redrawn when an event may have changed it
+        for event in pygame.event.get():
+            redraw = True
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                renderer.invalidate()  # Pause, background and HUD changes need a full frame
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                    worker.pause(paused)
+                    if paused:
+                        pause_start_ticks = pygame.time.get_ticks()  # Start tracking pause time
+                        events.info("input", "Simulation Paused")
+                    else:
+                        # Update paused time and calculate total elapsed time when resumed
+                        paused_time += pygame.time.get_ticks() - pause_start_ticks
+                        events.info("input", "Simulation Resumed")
+
+                # Adjust the background color using hotkeys
+                if event.key == pygame.K_r:  # Increase red value
+                    bg_color[0] = (bg_color[0] + 10) % 256  # Reset to 0 if over 255
+                    events.info("input", f"Updated background color: {bg_color}")
+                elif event.key == pygame.K_g:  # Increase green value
+                    bg_color[1] = (bg_color[1] + 10) % 256  # Reset to 0 if over 255
+                    events.info("input", f"Updated background color: {bg_color}")
+                elif event.key == pygame.K_b:  # Increase blue value
+                    bg_color[2] = (bg_color[2] + 10) % 256  # Reset to 0 if over 255
+                    events.info("input", f"Updated background color: {bg_color}")
+
+                # Increase all color values by 10 when W is pressed
+                elif event.key == pygame.K_w:
+                    bg_color = [(c + 10) % 256 for c in bg_color]
+                    events.info("input", f"Updated background color by 10 to: {bg_color}")
+
+                # Reset all color values to 0 when 0 key is pressed (Black background)
+                elif event.key == pygame.K_0:
+                    bg_color = [0, 0, 0]
+                    events.info("input", f"Reset background color to black: {bg_color}")
+
+                if event.key == pygame.K_i:
+                    # Set velocity of all planets inward towards the center, excluding black holes
+                    worker.push(CENTER_X, CENTER_Y, -11)  # Adjust speed here as needed
+
+                elif event.key == pygame.K_o:
+                    # Set velocity of all planets outward from the center, excluding black holes
+                    worker.push(CENTER_X, CENTER_Y, 11)  # Adjust speed here as needed
+
+                # Performance HUD toggle and export of its frame history
+                if event.key == pygame.K_p:
+                    worker.time_stages(profiler.toggle())
+                    events.info("input", f"Profiling HUD {'on' if profiler.enabled else 'off'}")
+                elif event.key == pygame.K_e:
+                    profiler.export(config.PROFILE_EXPORT)
+                    events.info("input", f"Exported frame timings to {config.PROFILE_EXPORT}")
+
+                # Snapshot of the whole simulation (S), taken on the worker between two steps,
+                # and resuming from it (L)
+                elif event.key == pygame.K_s:
+                    now = pause_start_ticks if paused else pygame.time.get_ticks()
+                    runtime = {"paused": paused, "elapsed_ms": now - start_ticks - paused_time,
+                               "bg_color": list(bg_color)}
+
+                    def save(worker, runtime=runtime):
+                        try:
+                            save_snapshot(config.SNAPSHOT_FILE, worker.simulation,
+                                          {**runtime, "accumulator": worker.accumulator})
+                        except OSError as e:
+                            events.warning("input", f"Could not save snapshot {config.SNAPSHOT_FILE}: {e}")
+                        else:
+                            events.info("input", f"Saved snapshot of {len(worker.simulation.store)} bodies "
+                                                 f"to {config.SNAPSHOT_FILE}")
+                    worker.submit(save)
+                elif event.key == pygame.K_l:
+                    try:
+                        simulation, saved = resume(config.SNAPSHOT_FILE, events)
+                    except (OSError, ValueError) as e:
+                        events.warning("input", f"Could not load snapshot {config.SNAPSHOT_FILE}: {e}")
+                    else:
+                        # Snapshots from headless.py and sweep.py have no runtime state: keep the current one
+                        now = pause_start_ticks if paused else pygame.time.get_ticks()
+                        paused = saved.get("paused", paused)
+                        accumulator = saved.get("accumulator", 0.0)
+                        elapsed_ms = saved.get("elapsed_ms", now - start_ticks - paused_time)
+                        bg_color = list(saved.get("bg_color", bg_color))
+
+                        def load(worker, simulation=simulation, paused=paused, accumulator=accumulator):
+                            worker.replace(simulation)
+                            worker.paused = paused
+                            worker.accumulator = accumulator
+                        worker.submit(load)
+
+                        # Restart the timer at the snapshot's elapsed time
+                        start_ticks = pygame.time.get_ticks() - elapsed_ms
+                        paused_time = 0
+                        pause_start_ticks = pygame.time.get_ticks() if paused else None
+                        events.info("input", f"Resumed {len(simulation.store)} bodies from {config.SNAPSHOT_FILE}")
+
+        if timing:
+            profiler.add("events", time.perf_counter() - stage_start)
+
+        worker.check()  # Re-raise a physics error here rather than drawing a frozen scene
+        state = worker.latest()
+
+        if redraw:
+            if timing:
+                stage_start = time.perf_counter()
+
+            # Render timer text (Elapsed time, adjusted for pause), only if not paused
+            overlays = []
+            if not paused:
+                elapsed_time = (pygame.time.get_ticks() - start_ticks - paused_time) / 1000
+                overlays.append((font.render(f"Time: {elapsed_time:.2f}s", True, config.WHITE),
+                                 (config.SCREEN_WIDTH - 100, 10)))
+
+            # Display RGB values only if RGB_TOGGLE is True
+            if config.RGB_TOGGLE:
+                overlays.append((font.render(f"RGB: {bg_color[0]}, {bg_color[1]}, {bg_color[2]}", True, config.WHITE),
+                                 (10, 10)))
+
+            # Energy drift since the first diagnostics sample, red once past the alarm threshold
+            if state.diagnostics is not None:
+                drift = state.diagnostics["energy_drift"]
+                color = (255, 80, 80) if state.drift_alarm else config.WHITE
+                overlays.append((font.render(f"Energy drift: {drift:.2e}", True, color),
+                                 (config.SCREEN_WIDTH - 200, 30)))
+
+            # Performance HUD, below the RGB readout
+            if profiler.enabled:
+                for row, line in enumerate(profiler.hud_lines()):
+                    overlays.append((font.render(line, True, config.WHITE), (10, 40 + 20 * row)))
+
+            # Bodies interpolated between the last two physics states, by the time since the latest was published
+            if state.paused:
+                render_x, render_y = state.store.x, state.store.y
+            else:
+                alpha = min((time.perf_counter() - state.published) / worker.step_seconds, 1.0)
+                render_x, render_y = state.store.interpolated(alpha)
+            renderer.draw(state.store, render_x, render_y, bg_color, overlays)
+            if timing:
+                profiler.add("draw", time.perf_counter() - stage_start)
+
+        # One write for the frame's text events
+        events.flush()
+
+        frame_seconds = clock.tick(config.FPS) / 1000
+        if timing:
+            profiler.merge(state.stage_times)  # The physics stages the worker timed since the last frame
+            profiler.end_frame(frame_seconds, len(state.store), state.collision_candidates)
+
+    worker.stop()  # Finishes the current step and closes the trajectory recording
+
+    labels, sprites = renderer.labels, renderer.black_hole_sprites
+    events.info("render", f"Label cache: {labels.hits} hits, {labels.misses} misses, {len(labels)} labels cached")
+    events.info("render", f"Black hole sprites: {sprites.hits} hits, {sprites.misses} misses")
+    events.info("events", f"{events.dropped} binary records dropped")
+    events.close()
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
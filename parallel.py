@@ -0,0 +1,139 @@
+"""Multi-core gravity: tiles of target bodies evaluated across a process pool.
+
+Positions, masses and results live in one multiprocessing.shared_memory block,
+so a step only copies the arrays into it and sends each worker a few integers.
+Every tile owns a disjoint, contiguous range of output rows and sums its rows
+in the same order as the serial NumPy stage, so results do not depend on the
+worker count or on which worker finishes first.
+
+The pool is started with forkserver (spawn where that is unavailable) rather
+than fork: it is created from the simulation thread while pygame and the event
+log hold locks on other threads, and a forked child would inherit them held.
+Children import the main module, so entry points must be import-safe.
+"""
+import atexit
+import multiprocessing
+import os
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+import physics
+
+# Below this many target bodies the serial NumPy stage is faster than a round trip to the pool
+PARALLEL_MIN_BODIES = 2048
+
+# Tiles handed out per worker, so a slow tile does not leave the other cores idle
+TILES_PER_WORKER = 4
+
+# Shared block layout: one array per field, one element per body, in this order
+_LAYOUT = (("x", np.float64), ("y", np.float64), ("mass", np.float64), ("rows", np.int64),
+           ("ax", np.float64), ("ay", np.float64), ("black_hole", np.bool_))
+
+# Start method of the pool; fork is unsafe once the process runs other threads
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+_worker_shared = None  # (SharedMemory, arrays) inside each worker process
+
+
+def _shared_arrays(buffer, capacity):
+    """NumPy views of each field inside a shared memory buffer."""
+    arrays = {}
+    offset = 0
+    for name, dtype in _LAYOUT:
+        arrays[name] = np.ndarray(capacity, dtype=dtype, buffer=buffer, offset=offset)
+        offset += capacity * np.dtype(dtype).itemsize
+    return arrays
+
+
+def _block_size(capacity):
+    return sum(capacity * np.dtype(dtype).itemsize for _, dtype in _LAYOUT)
+
+
+def _attach(name, capacity):
+    """Pool initializer: map the shared block once per worker."""
+    global _worker_shared
+    shm = SharedMemory(name=name)
+    _worker_shared = (shm, _shared_arrays(shm.buf, capacity))
+
+
+def _tile(task):
+    """Compute the accelerations of rows [start, stop) of the target list into the shared output."""
+    n, start, stop, g = task
+    arrays = _worker_shared[1]
+    ax, ay = physics.gravity_accelerations(arrays["x"][:n], arrays["y"][:n], arrays["mass"][:n],
+                                           arrays["black_hole"][:n], g, targets=arrays["rows"][start:stop])
+    arrays["ax"][start:stop] = ax
+    arrays["ay"][start:stop] = ay
+
+
+class ParallelGravity:
+    """Process pool and shared memory block for tiled gravity evaluation."""
+
+    def __init__(self, workers):
+        self.workers = workers if workers > 0 else os.cpu_count() or 1
+        self.capacity = 0
+        self.shm = None
+        self.pool = None
+        self.arrays = None
+
+    def _reserve(self, n):
+        """(Re)create the shared block and the pool when the body count outgrows them."""
+        if n <= self.capacity:
+            return
+        self.close()
+        self.capacity = max(n, 2 * self.capacity, 1024)
+        self.shm = SharedMemory(create=True, size=_block_size(self.capacity))
+        self.arrays = _shared_arrays(self.shm.buf, self.capacity)
+        self.pool = multiprocessing.get_context(START_METHOD).Pool(self.workers, initializer=_attach,
+                                                                  initargs=(self.shm.name, self.capacity))
+
+    def accelerations(self, x, y, mass, black_hole, g=None, targets=None):
+        """Same result as physics.gravity_accelerations, computed across the pool."""
+        g = physics.G if g is None else g
+        rows = np.arange(len(x)) if targets is None else np.asarray(targets, dtype=np.int64)
+        if len(rows) < PARALLEL_MIN_BODIES or self.workers == 1:
+            return physics.gravity_accelerations(x, y, mass, black_hole, g, targets=rows)
+
+        n = len(x)
+        self._reserve(max(n, len(rows)))
+        arrays = self.arrays
+        arrays["x"][:n] = x
+        arrays["y"][:n] = y
+        arrays["mass"][:n] = mass
+        arrays["black_hole"][:n] = black_hole
+        arrays["rows"][:len(rows)] = rows
+
+        bounds = np.linspace(0, len(rows), self.workers * TILES_PER_WORKER + 1).astype(np.int64)
+        tasks = [(n, int(start), int(stop), g) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+        self.pool.map(_tile, tasks, chunksize=1)
+
+        return arrays["ax"][:len(rows)].copy(), arrays["ay"][:len(rows)].copy()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.shm is not None:
+            self.arrays = None
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+        self.capacity = 0
+
+
+_pools = {}
+
+
+def get_parallel_gravity(workers):
+    """Shared ParallelGravity per worker count, created on first use and closed at exit."""
+    if workers not in _pools:
+        _pools[workers] = ParallelGravity(workers)
+    return _pools[workers]
+
+
+@atexit.register
+def _close_pools():
+    for pool in _pools.values():
+        pool.close()
@@ -1,266 +1,229 @@
 import os
 import logging
-from planet import Planet
-from settings import SCREEN_WIDTH, SCREEN_HEIGHT, BLACK_HOLE_COLOR
 
-# Settings path
-SETTINGS_FILE = "settings.py"
+import numpy as np
+
+from bodies import BodyStore
+from flant import Bodies, parse as parse_flant
+from physics import GRAVITY_MODES, COLLISION_MODES
+from integrators import INTEGRATORS, MAX_LEVEL_LIMIT
+from settings import SCREEN_WIDTH, SCREEN_HEIGHT, SEED
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-import random
-
-
-def parse_build_file(file_path):
-    if not os.path.isfile(file_path):
-        logging.error(f"{file_path} does not exist! Using default settings.")
-        return []
-
-    new_settings = {}
-    planets = []
-    random_planets = False  # Flag to check if random planets are used
-
-    try:
-        with open(file_path, 'r') as file:
-            lines = file.readlines()
-
-        for line in lines:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue  # Skip empty lines or comments
-
-            if line.startswith("color ="):
-                try:
-                    new_settings['COLOR'] = eval(line.split("=", 1)[1].strip())
-                    logging.info(f"Updated color to: {new_settings['COLOR']}")
-                except Exception as e:
-                    logging.error(f"Invalid color format in build.txt. Using default color. Error: {e}")
-
-            elif line.startswith("tstep ="):
-                try:
-                    new_settings['TIME_STEP'] = float(line.split("=", 1)[1].strip())
-                    logging.info(f"Updated time step to: {new_settings['TIME_STEP']}")
-                except ValueError:
-                    logging.error("Invalid time step value in build.txt. Using default time step.")
-
-            elif line.startswith("g ="):
-                try:
-                    new_settings['G'] = float(line.split("=", 1)[1].strip())
-                    logging.info(f"Updated gravitational constant to: {new_settings['G']}")
-                except ValueError:
-                    logging.error("Invalid gravitational constant value in build.txt. Using default gravity.")
-
-            elif line.startswith("log ="):
-                try:
-                    new_settings['LOG_TOGGLE'] = bool(int(line.split("=", 1)[1].strip()))
-                    logging.info(f"Updated log toggle to: {new_settings['LOG_TOGGLE']}")
-                except ValueError:
-                    logging.error("Invalid log value in build.txt. Using default log toggle.")
-
-            elif line.startswith("rgb ="):
-                try:
-                    new_settings['RGB_TOGGLE'] = bool(int(line.split("=", 1)[1].strip()))
-                    logging.info(f"Updated RGB display toggle to: {new_settings['RGB_TOGGLE']}")
-                except ValueError:
-                    logging.error("Invalid rgb value in build.txt. Using default setting.")
-
-            elif line.startswith("p(") and line.endswith(")"):
-                # Planet data (p())
-                try:
-                    data = eval(line[1:])  # Extract the tuple part after "p"
-                    if len(data) == 6:
-                        x, y, mass, color, vx, vy = data
-                        planets.append(Planet(x, y, mass, color, vx, vy))
-                        logging.info(f"Added planet: {data}")
-                except Exception as e:
-                    logging.error(f"Invalid planet format: {line}. Error: {e}")
-
-            elif line.startswith("r(") and line.endswith(")"):
-                # Random planet generation (r())
-                try:
-                    data = eval(line[1:])  # Extract the tuple part after "r"
-                    if len(data) == 3:
-                        num_planets, random_velocity, max_mass = data
-                        if num_planets <= 0:
-                            logging.error(f"Invalid number of random planets: {num_planets}. Must be positive.")
-                            continue
-
-                        # Create random planets
-                        for _ in range(num_planets):
-                            x = random.randint(0, SCREEN_WIDTH)
-                            y = random.randint(0, SCREEN_HEIGHT)
-                            mass = random.randint(1, max_mass)  # Random mass for planets, constrained by max_mass
-                            color = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
-
-                            if random_velocity:
-                                vx = random.uniform(-0.3, 0.3)
-                                vy = random.uniform(-0.3, 0.3)
-                            else:
-                                vx = vy = 0
-
-                            planets.append(Planet(x, y, mass, color, vx, vy))
-                            logging.info(f"Added random planet: (x={x}, y={y}, mass={mass}, velocity=({vx}, {vy}))")
-                except Exception as e:
-                    logging.error(f"Invalid random planet format: {line}. Error: {e}")
-
-
-            elif line.startswith("sr(") and line.endswith(")"):
-
-                # Seeded random planet generation (sr())
-                try:
-
-                    # Strip off 'sr(' and ')', then evaluate the content inside
-                    data = eval(line[3:-1])  # Extract the tuple part after "sr("
-
-                    if len(data) == 5:
-
-                        num_planets, random_velocity, max_mass, pos_seed, mass_seed = data
-
-                        if num_planets <= 0:
-                            logging.error(f"Invalid number of random seeded planets: {num_planets}. Must be positive.")
-                            continue
-
-                        for _ in range(num_planets):
-
-                            # Determine position based on pos_seed:
-                            if pos_seed == -1:
-
-                                # Regular generation (uniform distribution)
-                                x = random.randint(0, SCREEN_WIDTH)
-                                y = random.randint(0, SCREEN_HEIGHT)
 
-                            elif pos_seed == 0:
+def _toggle(value):
+    return bool(int(value))
 
-                                # Majority near center using a Gaussian distribution
-                                x = int(random.gauss(SCREEN_WIDTH / 2, SCREEN_WIDTH / 8))
-                                y = int(random.gauss(SCREEN_HEIGHT / 2, SCREEN_HEIGHT / 8))
-                                x = max(0, min(SCREEN_WIDTH, x))
-                                y = max(0, min(SCREEN_HEIGHT, y))
 
-                            elif pos_seed == 1:
+def _integer(value):
+    if not float(value).is_integer():
+        raise ValueError(f"{value} is not an integer")
+    return int(value)
 
-                                # Majority near edge
-                                if random.random() < 0.5:
-                                    x = random.randint(0, SCREEN_WIDTH // 4)
 
-                                else:
-                                    x = random.randint(3 * SCREEN_WIDTH // 4, SCREEN_WIDTH)
+def _color(value):
+    if not (isinstance(value, tuple) and len(value) == 3 and all(0 <= _integer(c) <= 255 for c in value)):
+        raise ValueError("must be an (r, g, b) tuple with channels 0-255")
+    return tuple(int(c) for c in value)
 
-                                if random.random() < 0.5:
-                                    y = random.randint(0, SCREEN_HEIGHT // 4)
 
-                                else:
-                                    y = random.randint(3 * SCREEN_HEIGHT // 4, SCREEN_HEIGHT)
+def _fraction(value):
+    value = float(value)
+    if not 0 <= value <= 1:
+        raise ValueError("must be between 0 and 1")
+    return value
 
-                            else:
 
-                                # Fallback to regular generation if seed is unrecognized
-                                x = random.randint(0, SCREEN_WIDTH)
-                                y = random.randint(0, SCREEN_HEIGHT)
+def _positive(value):
+    value = float(value)
+    if not 0 < value < float("inf"):
+        raise ValueError("must be a positive number")
+    return value
 
-                            # Determine mass based on mass_seed:
-                            if mass_seed == -1:
 
-                                # Regular generation
-                                mass = random.randint(10, max_mass)
+def _level(value):
+    value = _integer(value)
+    if not 0 <= value <= MAX_LEVEL_LIMIT:
+        raise ValueError(f"must be between 0 and {MAX_LEVEL_LIMIT}")
+    return value
 
-                            elif mass_seed == 0:
 
-                                # All planets have maximum mass
-                                mass = max_mass
+def _choice(options):
+    def convert(value):
+        if value not in options:
+            raise ValueError(f"must be one of {options}")
+        return value
+    return convert
 
-                            elif mass_seed == 1:
 
-                                # All planets have minimum mass (10)
-                                mass = 10
+# build.txt setting -> (settings.py name, conversion, description)
+BUILD_SETTINGS = {
+    "color": ("COLOR", _color, "color"),
+    "tstep": ("TIME_STEP", float, "time step"),
+    "g": ("G", float, "gravitational constant"),
+    "log": ("LOG_TOGGLE", _toggle, "log toggle"),
+    "rgb": ("RGB_TOGGLE", _toggle, "RGB display toggle"),
+    "gravity": ("GRAVITY_MODE", _choice(GRAVITY_MODES), "gravity mode"),
+    "theta": ("THETA", float, "Barnes-Hut opening angle"),
+    "physics_hz": ("PHYSICS_HZ", _positive, "physics rate"),
+    "integrator": ("INTEGRATOR", _choice(tuple(INTEGRATORS)), "integrator"),
+    "step": ("STEP_SIZE", _positive, "step size"),
+    "eta": ("ADAPTIVE_ETA", _positive, "adaptive step tolerance"),
+    "max_level": ("ADAPTIVE_MAX_LEVEL", _level, "adaptive maximum level"),
+    "workers": ("WORKERS", _integer, "parallel gravity workers"),
+    "label_min_radius": ("LABEL_MIN_RADIUS", float, "minimum labelled radius"),
+    "dirty_rects": ("DIRTY_RECTS", _toggle, "dirty rectangle rendering"),
+    "seed": ("SEED", _integer, "random seed"),
+    "profile": ("PROFILE_HUD", _toggle, "profiling HUD"),
+    "collisions": ("COLLISION_MODE", _choice(COLLISION_MODES), "collision mode"),
+    "restitution": ("RESTITUTION", _fraction, "restitution"),
+    "diagnostics": ("DIAGNOSTICS_EVERY", _integer, "diagnostics interval"),
+    "drift_alarm": ("DRIFT_THRESHOLD", float, "drift alarm threshold"),
+}
 
-                            elif mass_seed == 2:
 
-                                # Gaussian distribution for mass
-                                mean = (max_mass + 10) / 2
-                                sigma = (max_mass - 10) / 4
-                                mass = int(random.gauss(mean, sigma))
-                                mass = max(10, min(max_mass, mass))
-
-                            elif mass_seed == 3:
-
-                                # Opposite of Gaussian: invert the Gaussian value.
-                                mean = (max_mass + 10) / 2
-                                sigma = (max_mass - 10) / 4
-                                g = int(random.gauss(mean, sigma))
-                                mass = max_mass + 10 - g
-                                mass = max(10, min(max_mass, mass))
-
-                            else:
-                                mass = random.randint(10, max_mass)
-
-                            # Standard color generation:
-                            color = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
+def parse_build_file(file_path):
+    """Parse a Flant build file into a BodyStore and a dict of settings.py overrides.
 
-                            # Velocity assignment:
-                            if random_velocity:
-                                vx = random.uniform(-0.6, 0.6)
-                                vy = random.uniform(-0.6, 0.6)
+    Syntax errors and invalid values are logged with their line number and skipped.
+    """
+    if not os.path.isfile(file_path):
+        logging.error(f"{file_path} does not exist! Using default settings.")
+        return BodyStore(), {}
 
-                            else:
-                                vx = vy = 0
+    try:
+        with open(file_path, "r") as file:
+            text = file.read()
+    except OSError as e:
+        logging.error(f"Error reading file: {e}")
+        return BodyStore(), {}
 
-                            planets.append(Planet(x, y, mass, color, vx, vy))
-                            logging.info(
-                                f"Added random seeded planet: (x={x}, y={y}, mass={mass}, velocity=({vx}, {vy}))")
+    return parse_build_text(text, file_path)
 
-                    else:
-                        logging.error("Invalid parameters for sr() - must provide 5 parameters.")
 
-                except Exception as e:
-                    logging.error(f"Invalid random seeded planet format: {line}. Error: {e}")
+def parse_build_text(text, file_path="<build>"):
+    """parse_build_file for build file text already in memory; file_path only appears in log messages."""
+    store = BodyStore()
+    new_settings = {}
 
-            elif line.startswith("b(") and line.endswith(")"):
+    try:
+        scene = parse_flant(text)
+
+        for error in scene.errors:
+            logging.error(f"{file_path} {error}")
+
+        for setting in scene.settings:
+            if setting.name not in BUILD_SETTINGS:
+                logging.error(f"{file_path} line {setting.line}: unknown setting {setting.name!r}")
+                continue
+            name, convert, description = BUILD_SETTINGS[setting.name]
+            try:
+                new_settings[name] = convert(setting.value)
+                logging.info(f"Updated {description} to: {new_settings[name]}")
+            except (ValueError, TypeError) as e:
+                logging.error(f"{file_path} line {setting.line}: invalid {setting.name} value {setting.value!r} "
+                              f"({e}). Using default {description}.")
+
+        # One generator for every r() and sr() in the file, so a fixed seed reproduces the whole scene
+        rng = np.random.default_rng(new_settings.get("SEED", SEED))
+
+        for item in scene.bodies:
+            if isinstance(item, Bodies):
+                store.extend(item.x, item.y, item.mass, item.color, item.vx, item.vy, item.black_hole)
+                black_holes = int(item.black_hole.sum())
+                logging.info(f"Added {len(item.x) - black_holes} planets and {black_holes} black holes "
+                             f"(lines {item.line[0]}-{item.line[-1]})")
+            elif item.count <= 0:
+                logging.error(f"{file_path} line {item.line}: invalid number of random planets: {item.count}. "
+                              f"Must be positive.")
+            else:
                 try:
-                    data = eval(line[1:])  # Extract the tuple part after "b"
-                    if len(data) == 3:
-                        x, y, mass = data
-                        planets.append(Planet(x, y, mass, BLACK_HOLE_COLOR, 0, 0, black_hole=True))
-                        logging.info(f"Added black hole: {data}")
-                except Exception as e:
-                    logging.error(f"Invalid black hole format: {line}. Error: {e}")
-
-
-        # Update settings.py with new values
-        update_settings_file(new_settings)
+                    generate = add_random_planets if item.directive == "r" else add_seeded_random_planets
+                    generate(store, item, rng)
+                except ValueError as e:
+                    logging.error(f"{file_path} line {item.line}: invalid {item.directive}() parameters: {e}")
 
     except Exception as e:
         logging.error(f"Error parsing file: {e}")
 
-    return planets  # Return parsed planets list
-
-
-
-def update_settings_file(new_settings):
-    """Write updated settings into settings.py."""
-    try:
-        with open(SETTINGS_FILE, "r") as file:
-            lines = file.readlines()
-
-        with open(SETTINGS_FILE, "w") as file:
-            for line in lines:
-                # Replace only the values that were updated
-                if line.startswith("COLOR") and "COLOR" in new_settings:
-                    file.write(f"COLOR = {new_settings['COLOR']}\n")
-                elif line.startswith("TIME_STEP") and "TIME_STEP" in new_settings:
-                    file.write(f"TIME_STEP = {new_settings['TIME_STEP']}\n")
-                elif line.startswith("G =") and "G" in new_settings:
-                    file.write(f"G = {new_settings['G']}\n")
-                elif line.startswith("LOG_TOGGLE") and "LOG_TOGGLE" in new_settings:
-                    file.write(f"LOG_TOGGLE = {new_settings['LOG_TOGGLE']}\n")
-                elif line.startswith("RGB_TOGGLE") and "RGB_TOGGLE" in new_settings:
-                    file.write(f"RGB_TOGGLE = {new_settings['RGB_TOGGLE']}\n")
-                else:
-                    file.write(line)  # Keep the line unchanged if it's not being updated
-
-        logging.info("settings.py successfully updated.")
-
-    except Exception as e:
-        logging.error(f"Failed to update settings.py: {e}")
+    return store, new_settings
+
+
+def add_random_planets(store, directive, rng):
+    """Random planet generation (r()), all bodies of the directive at once."""
+    n = directive.count
+    x = rng.integers(0, SCREEN_WIDTH, size=n, endpoint=True)
+    y = rng.integers(0, SCREEN_HEIGHT, size=n, endpoint=True)
+    mass = rng.integers(1, directive.max_mass, size=n, endpoint=True)  # Constrained by max_mass
+    _add_random(store, directive, rng, x, y, mass, 0.3)
+
+
+def add_seeded_random_planets(store, directive, rng):
+    """Seeded random planet generation (sr()): pos_seed and mass_seed pick the distributions."""
+    n, max_mass = directive.count, directive.max_mass
+
+    # Determine position based on pos_seed:
+    if directive.pos_seed == 0:
+        # Majority near center using a Gaussian distribution (truncated to int like the old int(gauss))
+        x = np.clip(rng.normal(SCREEN_WIDTH / 2, SCREEN_WIDTH / 8, n).astype(np.int64), 0, SCREEN_WIDTH)
+        y = np.clip(rng.normal(SCREEN_HEIGHT / 2, SCREEN_HEIGHT / 8, n).astype(np.int64), 0, SCREEN_HEIGHT)
+
+    elif directive.pos_seed == 1:
+        # Majority near edge: the outer quarter on either side, picked per coordinate
+        x = np.where(rng.random(n) < 0.5,
+                     rng.integers(0, SCREEN_WIDTH // 4, size=n, endpoint=True),
+                     rng.integers(3 * SCREEN_WIDTH // 4, SCREEN_WIDTH, size=n, endpoint=True))
+        y = np.where(rng.random(n) < 0.5,
+                     rng.integers(0, SCREEN_HEIGHT // 4, size=n, endpoint=True),
+                     rng.integers(3 * SCREEN_HEIGHT // 4, SCREEN_HEIGHT, size=n, endpoint=True))
+
+    else:
+        # Regular generation (uniform distribution), also the fallback for unrecognized seeds
+        x = rng.integers(0, SCREEN_WIDTH, size=n, endpoint=True)
+        y = rng.integers(0, SCREEN_HEIGHT, size=n, endpoint=True)
+
+    # Determine mass based on mass_seed:
+    mean = (max_mass + 10) / 2
+    sigma = (max_mass - 10) / 4
+    if directive.mass_seed == 0:
+        # All planets have maximum mass
+        mass = np.full(n, max_mass)
+
+    elif directive.mass_seed == 1:
+        # All planets have minimum mass (10)
+        mass = np.full(n, 10)
+
+    elif directive.mass_seed == 2:
+        # Gaussian distribution for mass
+        mass = np.clip(rng.normal(mean, sigma, n).astype(np.int64), 10, max_mass)
+
+    elif directive.mass_seed == 3:
+        # Opposite of Gaussian: invert the Gaussian value.
+        mass = np.clip(max_mass + 10 - rng.normal(mean, sigma, n).astype(np.int64), 10, max_mass)
+
+    else:
+        # Regular generation, also the fallback for unrecognized seeds
+        mass = rng.integers(10, max_mass, size=n, endpoint=True)
+
+    _add_random(store, directive, rng, x, y, mass, 0.6)
+
+
+def _add_random(store, directive, rng, x, y, mass, max_speed):
+    """Random colors and (optionally) velocities, then append the batch and log one summary line."""
+    n = directive.count
+    color = rng.integers(0, 255, size=(n, 3), endpoint=True).astype(np.uint8)
+    if directive.random_velocity:
+        vx = rng.uniform(-max_speed, max_speed, n)
+        vy = rng.uniform(-max_speed, max_speed, n)
+    else:
+        vx = vy = np.zeros(n)
+
+    store.extend(x, y, mass, color, vx, vy, np.zeros(n, dtype=bool))
+
+    seeds = "" if directive.pos_seed is None else f", pos_seed {directive.pos_seed}, mass_seed {directive.mass_seed}"
+    velocities = f"velocities within +-{max_speed}" if directive.random_velocity else "at rest"
+    logging.info(f"Added {n} random planets from {directive.directive}() on line {directive.line}{seeds}: "
+                 f"mass {mass.min()}-{mass.max()} (mean {mass.mean():.1f}), {velocities}")
@@ -1,13 +1,30 @@
-from planet import MASS_UNIT
-from settings import LOG_TOGGLE, G, TIME_STEP
+import numpy as np
+
+from planet import MASS_UNIT, body_radius
+from quadtree import QuadTree
+from settings import G, TIME_STEP, GRAVITY_MODE, THETA, WORKERS, COLLISION_MODE, RESTITUTION
 from utils import distance, normalize_vector
 import time  # For collision tracking
 
 # Convert KE to terajoules (TJ)
 KE_CONVERSION = 10**12  # Conversion factor for kinetic energy
 
+# Available gravity stages: the per-pair reference loop, the batched NumPy pass, Barnes-Hut
+# and the NumPy pass split across a process pool
+GRAVITY_MODES = ("python", "numpy", "barnes_hut", "parallel")
+
+# What two colliding planets do: bounce off each other (with RESTITUTION) or merge into one
+COLLISION_MODES = ("bounce", "merge")
+
+# Bytes of pairwise temporaries the NumPy stage may hold at once; its row blocks are sized to fit
+GRAVITY_BLOCK_BYTES = 64 * 2**20
+_GRAVITY_TEMPORARIES = 6  # Float64 rows x N arrays alive at the peak of one block (dx, dy, dist_sq, ...)
+
+# Bodies barnes_hut_error checks against the exact force (each against every body)
+BARNES_HUT_ERROR_SAMPLE = 256
+
 # Function to calculate the full gravitational force between two planets
-def calculate_gravity(p1, p2):
+def calculate_gravity(p1, p2, g=G):
     dx = p2.x - p1.x
     dy = p2.y - p1.y
     distance_val = distance(p1, p2)
@@ -16,7 +33,7 @@ def calculate_gravity(p1, p2):
         return 0, 0  # Prevent division by zero
 
     # Newton's Law of Universal Gravitation
-    force_magnitude = G * (p1.mass * p2.mass) / (distance_val ** 2)
+    force_magnitude = g * (p1.mass * p2.mass) / (distance_val ** 2)
 
     # Normalize direction and apply force magnitude
     nx, ny = normalize_vector(dx, dy)
@@ -25,8 +42,8 @@ def calculate_gravity(p1, p2):
     return fx, fy
 
 
-def apply_gravity(p1, p2, time_step):
-    fx, fy = calculate_gravity(p1, p2)  # Correct force calculation
+def apply_gravity(p1, p2, time_step, g=G):
+    fx, fy = calculate_gravity(p1, p2, g)  # Correct force calculation
 
     if p1.black_hole and p2.black_hole:
         return  # Two black holes do not move
@@ -47,12 +64,182 @@ def apply_gravity(p1, p2, time_step):
         p2.vy -= (fy / p2.mass) * time_step
 
 
+def gravity_accelerations(x, y, mass, black_hole, g=G, targets=None, potential=False):
+    """Return the gravitational acceleration of every body, computed in one batched pass.
+
+    With `targets` (an index array) only those bodies' accelerations are computed and
+    returned, still pulled by every body. With potential=True the gravitational
+    potential of each row is returned as well, from the same pairwise distances.
+    """
+    rows = np.arange(len(x)) if targets is None else np.asarray(targets, dtype=np.int64)
+    ax = np.zeros(len(rows))
+    ay = np.zeros(len(rows))
+    phi = np.zeros(len(rows)) if potential else None
+
+    block_rows = max(1, GRAVITY_BLOCK_BYTES // (max(len(x), 1) * 8 * _GRAVITY_TEMPORARIES))
+    for start in range(0, len(rows), block_rows):
+        block = rows[start:start + block_rows]
+        dx = x[np.newaxis, :] - x[block, np.newaxis]
+        dy = y[np.newaxis, :] - y[block, np.newaxis]
+        dist_sq = dx * dx + dy * dy
+
+        # Coincident bodies (including a body and itself) exert no force, like calculate_gravity
+        with np.errstate(divide="ignore"):
+            inv_cube = np.where(dist_sq > 0, dist_sq ** -1.5, 0.0)
+        weight = mass[np.newaxis, :] * inv_cube
+
+        ax[start:start + len(block)] = (weight * dx).sum(axis=1)
+        ay[start:start + len(block)] = (weight * dy).sum(axis=1)
+        if potential:
+            phi[start:start + len(block)] = (weight * dist_sq).sum(axis=1)  # m / |d| per pair
+
+    # The reference loop visits every pair in both orders and each visit pulls the
+    # planet once, so the effective pull is twice Newton's. Keep that so both paths agree.
+    ax *= 2 * g
+    ay *= 2 * g
+
+    # Black holes pull but never move (which also makes two black holes ignore each other)
+    ax[black_hole[rows]] = 0.0
+    ay[black_hole[rows]] = 0.0
+    if potential:
+        # The potential of the doubled pull, so the force is still its gradient
+        return ax, ay, phi * (-2 * g)
+    return ax, ay
+
+
+def barnes_hut_accelerations(x, y, mass, black_hole, theta=THETA, g=G, targets=None, potential=False):
+    """Return accelerations (and with potential=True the potential) approximated with a Barnes-Hut quadtree.
+
+    O(N log N) per call.
+    """
+    rows = np.arange(len(x)) if targets is None else np.asarray(targets, dtype=np.int64)
+    if not len(x):
+        empty = (np.zeros(len(rows)), np.zeros(len(rows)))
+        return empty + (np.zeros(len(rows)),) if potential else empty
+
+    tree = QuadTree(x, y, mass)
+    if potential:
+        # Black holes walk the tree too, for their share of the potential; they still never move
+        ax, ay, pot = tree.accelerations(rows, theta, potential=True)
+        ax[black_hole] = 0.0
+        ay[black_hole] = 0.0
+        return ax[rows] * 2 * g, ay[rows] * 2 * g, pot[rows] * (-2 * g)
+
+    # Black holes never move, so only normal bodies walk the tree
+    ax, ay = tree.accelerations(rows[~black_hole[rows]], theta)
+
+    # Same doubled pull as gravity_accelerations so every mode agrees
+    return ax[rows] * 2 * g, ay[rows] * 2 * g
+
+
+class _PointMass:
+    """Plain-float copy of a body for the reference loop, which would be slowed down by numpy scalars."""
+    __slots__ = ("x", "y", "mass", "vx", "vy", "black_hole")
+
+    def __init__(self, x, y, mass, black_hole):
+        self.x = x
+        self.y = y
+        self.mass = mass
+        self.vx = 0.0
+        self.vy = 0.0
+        self.black_hole = black_hole
+
+
+def python_accelerations(x, y, mass, black_hole, targets=None, g=G):
+    """Accelerations from the reference apply_gravity loop, run on plain Python copies of the bodies."""
+    planets = [_PointMass(*values) for values in zip(x.tolist(), y.tolist(), mass.tolist(), black_hole.tolist())]
+    gravity_python(planets, 1.0, g)
+    ax = np.array([planet.vx for planet in planets], dtype=float)
+    ay = np.array([planet.vy for planet in planets], dtype=float)
+    if targets is None:
+        return ax, ay
+    return ax[targets], ay[targets]
+
+
+def accelerations(x, y, mass, black_hole, mode=GRAVITY_MODE, theta=THETA, targets=None, workers=WORKERS, g=G,
+                  potential=False):
+    """Return the accelerations of every body (or only `targets`) from the selected gravity mode.
+
+    potential=True adds the gravitational potential of each body as a third array. The
+    numpy and Barnes-Hut modes get it from the distances they already compute; the
+    python and parallel modes need a separate NumPy pass for it.
+    """
+    if potential and mode in ("numpy", "barnes_hut"):
+        if mode == "numpy":
+            return gravity_accelerations(x, y, mass, black_hole, g, targets, potential=True)
+        return barnes_hut_accelerations(x, y, mass, black_hole, theta, g, targets, potential=True)
+    if potential:
+        ax, ay = accelerations(x, y, mass, black_hole, mode, theta, targets, workers, g)
+        return ax, ay, gravity_accelerations(x, y, mass, black_hole, g, targets, potential=True)[2]
+
+    if mode == "python":
+        return python_accelerations(x, y, mass, black_hole, targets, g)
+    elif mode == "numpy":
+        return gravity_accelerations(x, y, mass, black_hole, g, targets)
+    elif mode == "barnes_hut":
+        return barnes_hut_accelerations(x, y, mass, black_hole, theta, g, targets)
+    elif mode == "parallel":
+        from parallel import get_parallel_gravity  # Imported here: parallel.py itself imports physics
+        return get_parallel_gravity(workers).accelerations(x, y, mass, black_hole, g, targets)
+    else:
+        raise ValueError(f"Unknown gravity mode: {mode}")
+
+
+def gravity_python(planets, time_step, g=G):
+    """Reference gravity stage: apply_gravity for every ordered pair of planets."""
+    for i, p1 in enumerate(planets):
+        for j, p2 in enumerate(planets):
+            if i != j:
+                apply_gravity(p1, p2, time_step, g)
+
+
+def barnes_hut_error(store, theta=THETA, sample=BARNES_HUT_ERROR_SAMPLE):
+    """Compare Barnes-Hut against the exact pairwise force on the same scene.
+
+    Returns the RMS and maximum per-body relative error of the acceleration, over a
+    fixed random sample of `sample` bodies, so the check stays O(sample * N).
+    """
+    x, y, mass, black_hole = store.x, store.y, store.mass, store.black_hole
+    targets = np.arange(len(x))
+    if len(x) > sample:
+        targets = np.sort(np.random.default_rng(0).choice(len(x), sample, replace=False))
+    exact_x, exact_y = gravity_accelerations(x, y, mass, black_hole, targets=targets)
+    approx_x, approx_y = barnes_hut_accelerations(x, y, mass, black_hole, theta, targets=targets)
+
+    exact = np.hypot(exact_x, exact_y)
+    moving = exact > 0
+    if not moving.any():
+        return 0.0, 0.0
+
+    error = np.hypot(approx_x - exact_x, approx_y - exact_y)[moving] / exact[moving]
+    return float(np.sqrt(np.mean(error ** 2))), float(error.max())
 
-def resolve_collision(p1, p2, planets):
+
+def push_radially(store, center_x, center_y, speed):
+    """Set every planet's velocity to `speed` along the line from the center (negative: toward it).
+
+    Black holes and planets sitting exactly on the center are left alone.
+    """
+    dx = store.x - center_x
+    dy = store.y - center_y
+    dist = np.hypot(dx, dy)
+    moving = ~store.black_hole & (dist > 0)
+    store.vx[moving] = dx[moving] / dist[moving] * speed
+    store.vy[moving] = dy[moving] / dist[moving] * speed
+
+
+def resolve_collision(p1, p2, store, g=G, time_step=TIME_STEP, events=None, mode=COLLISION_MODE,
+                      restitution=RESTITUTION):
+    """Resolve a collision between two store views; returns the body scheduled for removal, if any.
+
+    events (an eventlog.EventLog) receives collision and absorption records.
+    mode "merge" merges two planets into one (see merge_bodies); black holes always absorb.
+    restitution is the bounce elasticity, from 0 (perfectly inelastic) to 1 (perfectly elastic).
+    """
     if p1.black_hole and p2.black_hole:
         # No collision occurs between two black holes; both are immovable
-        if LOG_TOGGLE:
-            print("Collision between two black holes (no movement).")
+        if events is not None:
+            events.debug("collision", "Collision between two black holes (no movement).")
         return
 
     if p1.black_hole:
@@ -73,17 +260,18 @@ def resolve_collision(p1, p2, planets):
         p2.y += ny * overlap * 2
 
         # Apply gravity as if the black hole is still attracting
-        fx, fy = calculate_gravity(p1, p2)
+        fx, fy = calculate_gravity(p1, p2, g)
 
         # Update the velocity of p2 based on gravity force
-        p2.vx -= (fx / p2.mass) * TIME_STEP
-        p2.vy -= (fy / p2.mass) * TIME_STEP
+        p2.vx -= (fx / p2.mass) * time_step
+        p2.vy -= (fy / p2.mass) * time_step
 
         # If the planet is inside the black hole's event horizon, remove it
         if distance_val <= p2.radius + p1.radius:
-            planets.remove(p2)
-            if LOG_TOGGLE:
-                print(f"Planet sucked into black hole at ({p2.x}, {p2.y})")  # Debug info
+            store.mark_removed(p2.index)
+            if events is not None:
+                events.absorption(p2.index, p1.index, p2.x, p2.y, p2.mass)
+            return p2
 
         return
 
@@ -105,21 +293,25 @@ def resolve_collision(p1, p2, planets):
         p1.y += ny * overlap * 2
 
         # Apply gravity as if the black hole is still attracting
-        fx, fy = calculate_gravity(p1, p2)
+        fx, fy = calculate_gravity(p1, p2, g)
 
         # Update the velocity of p1 based on gravity force
-        p1.vx += (fx / p1.mass) * TIME_STEP
-        p1.vy += (fy / p1.mass) * TIME_STEP
+        p1.vx += (fx / p1.mass) * time_step
+        p1.vy += (fy / p1.mass) * time_step
 
         # If the planet is inside the black hole's event horizon, remove it
         if distance_val <= p1.radius + p2.radius:
-            planets.remove(p1)
-            if LOG_TOGGLE:
-                print(f"Planet sucked into black hole at ({p1.x}, {p1.y})")  # Debug info
+            store.mark_removed(p1.index)
+            if events is not None:
+                events.absorption(p1.index, p2.index, p1.x, p1.y, p1.mass)
+            return p1
 
         return
 
     # If neither is a black hole, proceed with normal collision handling (both planets move)
+    if mode == "merge":
+        return merge_bodies(p1, p2, store, events)  # Needs no collision normal, so coincident planets merge too
+
     dx = p2.x - p1.x
     dy = p2.y - p1.y
     distance_val = distance(p1, p2)
@@ -147,9 +339,6 @@ def resolve_collision(p1, p2, planets):
     dvy = p1.vy - p2.vy
     impact_speed = dvx * nx + dvy * ny
 
-    # Coefficient of restitution (elasticity)
-    restitution = 1  # Perfectly elastic collision
-
     # Impulse calculation
     impulse = -(1 + restitution) * impact_speed / (1 / p1.mass + 1 / p2.mass)
     p1.vx += (impulse * nx) / p1.mass
@@ -163,12 +352,35 @@ def resolve_collision(p1, p2, planets):
     total_ke_after = ke1_after + ke2_after
 
     # Log kinetic energy before and after impact
-    if LOG_TOGGLE:
-        print(f"Collision between planets:")
-        print(f"  Planet 1: KE before = {ke1_before / KE_CONVERSION:.6f} TJ, KE after = {ke1_after / KE_CONVERSION:.6f} TJ")
-        print(f"  Planet 2: KE before = {ke2_before / KE_CONVERSION:.6f} TJ, KE after = {ke2_after / KE_CONVERSION:.6f} TJ")
-        print(f"  Total KE: before = {total_ke_before / KE_CONVERSION:.6f} TJ, after = {total_ke_after / KE_CONVERSION:.6f} TJ\n")
+    if events is not None:
+        events.collision(p1.index, p2.index, (p1.x + p2.x) / 2, (p1.y + p2.y) / 2,
+                         total_ke_before / KE_CONVERSION, total_ke_after / KE_CONVERSION)
 
     if impact_speed > 0:
         return  # No collision response needed if already moving apart
 
+
+def merge_bodies(p1, p2, store, events=None):
+    """Merge two colliding planets into the heavier one; returns the body scheduled for removal.
+
+    Mass and momentum are conserved: the merged planet sits at the center of mass,
+    moves with the combined momentum and gets the radius of its new mass.
+    """
+    survivor, merged = (p1, p2) if p1.mass >= p2.mass else (p2, p1)
+    m1, m2 = survivor.mass, merged.mass
+    mass = m1 + m2
+    ke_before = 0.5 * MASS_UNIT * (m1 * (survivor.vx ** 2 + survivor.vy ** 2) + m2 * (merged.vx ** 2 + merged.vy ** 2))
+
+    survivor.x = (m1 * survivor.x + m2 * merged.x) / mass
+    survivor.y = (m1 * survivor.y + m2 * merged.y) / mass
+    survivor.vx = (m1 * survivor.vx + m2 * merged.vx) / mass
+    survivor.vy = (m1 * survivor.vy + m2 * merged.vy) / mass
+    survivor.mass = mass
+    survivor.radius = body_radius(mass)
+    store.mark_removed(merged.index)
+
+    if events is not None:
+        ke_after = 0.5 * (mass * MASS_UNIT) * (survivor.vx ** 2 + survivor.vy ** 2)
+        events.collision(survivor.index, merged.index, survivor.x, survivor.y, ke_before / KE_CONVERSION,
+                         ke_after / KE_CONVERSION)
+    return merged
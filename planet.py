@@ -1,85 +1,131 @@
-import pygame
 import math
 
-from flanetary.settings import BLACK_HOLE_COLOR
+from settings import BLACK_HOLE_COLOR
 from settings import SCREEN_WIDTH, SCREEN_HEIGHT
 from utils import clamp
 
 DENSITY = 3000  # kg/m³
 MASS_UNIT = 10**15  # 10^12 tons in kg
+BLACK_HOLE_RADIUS = 63
 from settings import SCALE
 
-class Planet:
-    def __init__(self, x, y, mass, color, vx, vy, black_hole=False):
-        self.x = x
-        self.y = y
-        self.mass = mass
-        self.color = BLACK_HOLE_COLOR if black_hole else color
-        self.radius = 63 if black_hole else ((3 * (mass * MASS_UNIT) / (4 * 3.14159 * DENSITY)) ** (1 / 3)) * SCALE
-        print(self.radius)
-        self.vx = 0 if black_hole else vx
-        self.vy = 0 if black_hole else vy
-        self.black_hole = black_hole
-        self.time = 0
+
+def body_radius(mass):
+    """Radius of a planet of the given mass at constant density; works on scalars and arrays."""
+    return ((3 * (mass * MASS_UNIT) / (4 * 3.14159 * DENSITY)) ** (1 / 3)) * SCALE
+
+
+def animated_color(time):
+    """Animate between (252, 249, 149) and (240, 168, 86) using sine wave."""
+    t = (math.sin(time) + 1) / 2  # Normalize sine wave from -1..1 to 0..1
+    r = int(252 * (1 - t) + 240 * t)
+    g = int(249 * (1 - t) + 168 * t)
+    b = int(149 * (1 - t) + 86 * t)
+    return (r, g, b)
+
+
+def accretion_disk_points(x, y, radius):
+    """Outline of the accretion disk polygon of a black hole centered at (x, y)."""
+    # Accretion disk settings
+    disk_half_width = radius * 2.5
+    disk_thickness = radius * 0.15
+    points = []
+    num_segments = 50  # Smoothness
+
+    # Top part: inward curve (concave)
+    for i in range(num_segments + 1):
+        angle = math.pi * (i / num_segments)
+        x_offset = math.cos(angle) * disk_half_width
+        y_offset = -abs(math.sin(angle) ** 2) * disk_thickness  # Inward curve
+        points.append((x - x_offset, y + y_offset + 5))
+
+    # Bottom part: outward curve (convex)
+    for i in range(num_segments + 1):
+        angle = math.pi * (1 - i / num_segments)
+        x_offset = math.cos(angle) * disk_half_width
+        y_offset = math.sin(angle) ** 3.5 * disk_thickness  # Outward curve
+        points.append((x + x_offset, y + y_offset + 5))
+
+    return points
+
+
+def draw_black_hole(screen, x, y, radius, color):
+    """Core, animated ring and accretion disk of a black hole."""
+    import pygame
+
+    # Core black hole
+    pygame.draw.circle(screen, (0, 0, 0), (int(x), int(y)), int(radius))
+
+    # Animated ring around the black hole
+    pygame.draw.circle(screen, color, (int(x), int(y)), int(radius * 1.2), 12)
+
+    # Draw the animated accretion disk
+    pygame.draw.polygon(screen, color, accretion_disk_points(x, y, radius))
+
+
+class Body:
+    """Drawing and animation shared by standalone planets and views into a BodyStore."""
+    __slots__ = ()
 
     def get_animated_color(self):
-        """Animate between (252, 249, 149) and (240, 168, 86) using sine wave."""
-        t = (math.sin(self.time) + 1) / 2  # Normalize sine wave from -1..1 to 0..1
-        r = int(252 * (1 - t) + 240 * t)
-        g = int(249 * (1 - t) + 168 * t)
-        b = int(149 * (1 - t) + 86 * t)
-        return (r, g, b)
-
-    def draw(self, screen, font):
-        """Draw planets and black holes with proper rendering."""
+        """Current pulsating color of a black hole."""
+        return animated_color(self.time)
+
+    def draw(self, screen, font, position=None, label_min_radius=0, sprites=None):
+        """Draw planets and black holes with proper rendering.
+
+        position overrides (x, y), e.g. with a position interpolated between physics steps.
+        font may be a render.LabelCache. Labels are skipped for bodies whose radius is
+        below label_min_radius pixels. With sprites (a render.BlackHoleSprites), black
+        holes are blitted from pre-rendered frames instead of being drawn from scratch.
+        """
+        # Imported here so that simulation-only code (e.g. headless.py) never loads pygame
+        import pygame
+
+        x, y = (self.x, self.y) if position is None else position
+
         if self.black_hole:
-            # Get the pulsating color for black hole
-            animated_color = self.get_animated_color()
-
-            # Core black hole
-            pygame.draw.circle(screen, (0, 0, 0), (int(self.x), int(self.y)), int(self.radius))
-
-            # Animated ring around the black hole
-            pygame.draw.circle(screen, animated_color, (int(self.x), int(self.y)), int(self.radius * 1.2), 12)
-
-            # Accretion disk settings
-            disk_half_width = self.radius * 2.5
-            disk_thickness = self.radius * 0.15
-            points = []
-            num_segments = 50  # Smoothness
-
-            # Top part: inward curve (concave)
-            for i in range(num_segments + 1):
-                angle = math.pi * (i / num_segments)
-                x_offset = math.cos(angle) * disk_half_width
-                y_offset = -abs(math.sin(angle) ** 2) * disk_thickness  # Inward curve
-                points.append((self.x - x_offset, self.y + y_offset + 5))
-
-            # Bottom part: outward curve (convex)
-            for i in range(num_segments + 1):
-                angle = math.pi * (1 - i / num_segments)
-                x_offset = math.cos(angle) * disk_half_width
-                y_offset = math.sin(angle) ** 3.5 * disk_thickness  # Outward curve
-                points.append((self.x + x_offset, self.y + y_offset + 5))
-
-            # Draw the animated accretion disk
-            pygame.draw.polygon(screen, animated_color, points)
+            if sprites is not None:
+                sprite, (offset_x, offset_y) = sprites.get(self.radius, self.time)
+                screen.blit(sprite, (int(x) - offset_x, int(y) - offset_y))
+            else:
+                # Get the pulsating color for black hole
+                draw_black_hole(screen, x, y, self.radius, self.get_animated_color())
 
             # Labels
+            if self.radius < label_min_radius:
+                return
             label_text = font.render("Black Hole", True, (255, 255, 255))
-            mass_text = font.render(f"Mass: {self.mass}^15kg", True, (255, 255, 255))
-            screen.blit(label_text, (int(self.x) - label_text.get_width() // 2, int(self.y) - self.radius - 20))
-            screen.blit(mass_text, (int(self.x) - mass_text.get_width() // 2, int(self.y) - self.radius - 40))
+            mass_text = font.render(f"Mass: {self.mass:g}^15kg", True, (255, 255, 255))
+            screen.blit(label_text, (int(x) - label_text.get_width() // 2, int(y) - self.radius - 20))
+            screen.blit(mass_text, (int(x) - mass_text.get_width() // 2, int(y) - self.radius - 40))
 
         else:
             # Draw regular planets
-            pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), int(self.radius))
+            pygame.draw.circle(screen, self.color, (int(x), int(y)), int(self.radius))
 
             # Labels for regular planets
-            mass_text = font.render(f"Mass: {self.mass}^15kg", True, (255, 255, 255))
+            if self.radius < label_min_radius:
+                return
+            mass_text = font.render(f"Mass: {self.mass:g}^15kg", True, (255, 255, 255))
             radius_text = font.render(f"Radius: {int(self.radius)} km", True, (255, 255, 255))
-            screen.blit(mass_text, (int(self.x) - mass_text.get_width() // 2, int(self.y) - self.radius - 20))
-            screen.blit(radius_text, (int(self.x) - radius_text.get_width() // 2, int(self.y) - self.radius - 40))
+            screen.blit(mass_text, (int(x) - mass_text.get_width() // 2, int(y) - self.radius - 20))
+            screen.blit(radius_text, (int(x) - radius_text.get_width() // 2, int(y) - self.radius - 40))
+
+
+class Planet(Body):
+    __slots__ = ("x", "y", "mass", "color", "radius", "vx", "vy", "black_hole", "time")
+
+    def __init__(self, x, y, mass, color, vx, vy, black_hole=False):
+        self.x = x
+        self.y = y
+        self.mass = mass
+        self.color = BLACK_HOLE_COLOR if black_hole else color
+        self.radius = BLACK_HOLE_RADIUS if black_hole else body_radius(mass)
+        self.vx = 0 if black_hole else vx
+        self.vy = 0 if black_hole else vy
+        self.black_hole = black_hole
+        self.time = 0
 
     def calculate_radius(self):
         """Calculate radius based on mass and constant density."""
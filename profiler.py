@@ -0,0 +1,112 @@
+"""Per-stage frame profiler behind the performance HUD.
+
+Stages add their wall time to the current frame with add(); end_frame() stores the
+frame as one FRAME_DTYPE row in a fixed-size ring, which the HUD and the
+percentiles read. Nothing is timed while the profiler is disabled: main.py only
+times its own stages, and has the simulation worker time its stages, when
+`enabled` is set, so a disabled profiler costs one attribute check per frame.
+
+Each thread times into its own Profiler. The worker never ends a frame: its
+`current` totals only grow and are published with every State, and merge()
+adds what they grew by to the render loop's frame.
+"""
+import csv
+import json
+import time
+
+import numpy as np
+
+from settings import PROFILE_HISTORY
+
+STAGES = ("events", "collision_detection", "collision_resolution", "gravity", "integration", "draw")
+
+FRAME_DTYPE = np.dtype([("frame", "i8"), ("frame_ms", "f8")] + [(stage + "_ms", "f8") for stage in STAGES]
+                       + [("bodies", "i8"), ("pairs", "i8")])
+
+# Short stage names for the HUD
+_HUD_NAMES = {"events": "events", "collision_detection": "collide (detect)",
+              "collision_resolution": "collide (resolve)", "gravity": "gravity", "integration": "integrate",
+              "draw": "draw"}
+
+
+class Profiler:
+    def __init__(self, history=PROFILE_HISTORY, enabled=False):
+        self.enabled = enabled
+        self.current = dict.fromkeys(STAGES, 0.0)  # Seconds per stage in the frame being measured
+        self._frames = np.zeros(max(int(history), 1), dtype=FRAME_DTYPE)
+        self._count = 0  # Frames ever recorded
+        self._merged = None  # Another thread's totals at the last merge(), None until the first
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self._merged = None  # Stages timed before the toggle are not part of the next frame
+        return self.enabled
+
+    def add(self, stage, seconds):
+        self.current[stage] += seconds
+
+    def merge(self, totals):
+        """Add another thread's running stage totals (seconds, never reset) to the current frame.
+
+        Only what they grew by since the previous merge is added; the first merge just
+        takes them as the starting point.
+        """
+        if self._merged is not None:
+            for stage, seconds in totals.items():
+                self.current[stage] += seconds - self._merged.get(stage, 0.0)
+        self._merged = dict(totals)
+
+    def end_frame(self, frame_seconds, bodies, pairs):
+        """Store the current frame (frame_seconds: time since the previous frame) and start the next one."""
+        row = self._frames[self._count % len(self._frames)]
+        row["frame"] = self._count
+        row["frame_ms"] = frame_seconds * 1000
+        for stage, seconds in self.current.items():
+            row[stage + "_ms"] = seconds * 1000
+            self.current[stage] = 0.0
+        row["bodies"] = bodies
+        row["pairs"] = pairs
+        self._count += 1
+
+    def frames(self):
+        """The recorded frames still in the history, oldest first."""
+        count = min(self._count, len(self._frames))
+        return self._frames[np.arange(self._count - count, self._count) % len(self._frames)]
+
+    def summary(self):
+        """Mean milliseconds per stage and rolling frame time percentiles, as plain JSON-friendly values."""
+        frames = self.frames()
+        if not len(frames):
+            return {"frames": 0}
+        summary = {"frames": len(frames)}
+        for stage in STAGES:
+            summary[stage + "_ms"] = float(frames[stage + "_ms"].mean())
+        summary["frame_ms_p50"], summary["frame_ms_p99"] = (float(p) for p in
+                                                            np.percentile(frames["frame_ms"], (50, 99)))
+        summary["bodies"] = int(frames["bodies"][-1])
+        summary["pairs"] = int(frames["pairs"][-1])
+        return summary
+
+    def hud_lines(self):
+        """Text lines of the performance overlay: the last frame's stages, counts and percentiles."""
+        if not self._count:
+            return ["Profiling..."]
+        last = self._frames[(self._count - 1) % len(self._frames)]
+        summary = self.summary()
+        lines = [f"{_HUD_NAMES[stage]}: {last[stage + '_ms']:.2f} ms" for stage in STAGES]
+        lines.append(f"bodies: {last['bodies']}  pairs: {last['pairs']}")
+        lines.append(f"frame p50: {summary['frame_ms_p50']:.1f} ms  p99: {summary['frame_ms_p99']:.1f} ms")
+        return lines
+
+    def export(self, path):
+        """Write the frame history to a .csv file, or to JSON (frames and summary) for any other extension."""
+        frames = self.frames()
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(FRAME_DTYPE.names)
+                writer.writerows(frames.tolist())
+        else:
+            with open(path, "w") as file:
+                json.dump({"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "summary": self.summary(),
+                           "frames": [dict(zip(FRAME_DTYPE.names, row)) for row in frames.tolist()]}, file, indent=2)
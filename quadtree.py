@@ -0,0 +1,156 @@
+import numpy as np
+
+from utils import expand_ranges
+
+# Deepest quadtree level; bodies still sharing a cell at this depth are summed directly
+MAX_DEPTH = 16
+
+
+def _spread_bits(v):
+    """Spread the low 16 bits of v so that a zero bit sits between each of them."""
+    v = v & 0xFFFF
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    v = (v | (v << 1)) & 0x55555555
+    return v
+
+
+def morton_keys(x, y, depth=MAX_DEPTH):
+    """Return the Z-order key of each position inside the square bounding box of all positions."""
+    x0, y0 = x.min(), y.min()
+    side = max(x.max() - x0, y.max() - y0, 1e-9)
+    cells = 1 << depth
+    ix = np.clip(((x - x0) / side * cells).astype(np.int64), 0, cells - 1)
+    iy = np.clip(((y - y0) / side * cells).astype(np.int64), 0, cells - 1)
+    return _spread_bits(ix) | (_spread_bits(iy) << 1), side
+
+
+class QuadTree:
+    """Quadtree over 2D positions, stored as flat per-node arrays.
+
+    Bodies are sorted by Morton key so every node covers a contiguous range
+    [start, start + count) of the sorted order, and the children of a node are
+    a contiguous range of the next level's nodes.
+    """
+
+    def __init__(self, x, y, mass, depth=MAX_DEPTH):
+        n = len(x)
+        keys, side = morton_keys(x, y, depth)
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys
+        sorted_keys = keys[self.order]
+
+        m = mass[self.order]
+        xs = x[self.order]
+        ys = y[self.order]
+
+        levels = []
+        active = np.arange(n)  # Sorted positions whose parent node holds more than one body
+        for level in range(depth + 1):
+            shift = 2 * (depth - level)
+            prefix = sorted_keys[active] >> shift
+            boundary = np.flatnonzero(np.concatenate(([True], prefix[1:] != prefix[:-1])))
+            start = active[boundary]
+            count = np.diff(np.concatenate((boundary, [len(active)])))
+
+            # Each node is a contiguous run of the active positions, so reduceat sums it directly
+            node_mass = np.add.reduceat(m[active], boundary)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cx = np.where(node_mass > 0, np.add.reduceat(m[active] * xs[active], boundary) / node_mass,
+                              np.add.reduceat(xs[active], boundary) / count)
+                cy = np.where(node_mass > 0, np.add.reduceat(m[active] * ys[active], boundary) / node_mass,
+                              np.add.reduceat(ys[active], boundary) / count)
+
+            # A single body is its own center of mass; use its exact position so it never pulls itself
+            cx = np.where(count == 1, xs[start], cx)
+            cy = np.where(count == 1, ys[start], cy)
+            levels.append((level, start, count, prefix[boundary], node_mass, cx, cy))
+
+            # Only nodes with more than one body are subdivided further
+            active = active[np.repeat(count > 1, count)]
+            if not active.size:
+                break
+
+        self.level = np.concatenate([np.full(len(entry[1]), entry[0]) for entry in levels])
+        self.start, self.count, self.prefix, self.mass, self.cx, self.cy = (
+            np.concatenate([entry[i] for entry in levels]) for i in range(1, 7))
+        self.shift = 2 * (depth - self.level)
+        self.size = side / (1 << self.level).astype(float)
+
+        # Children of a node are the next-level nodes that start inside its range
+        self.child_lo = np.zeros(len(self.start), dtype=np.int64)
+        self.child_hi = np.zeros(len(self.start), dtype=np.int64)
+        offset = 0
+        for (_, start, count, *_), nxt in zip(levels, levels[1:] + [None]):
+            if nxt is not None:
+                next_offset = offset + len(start)
+                split = count > 1
+                lo = np.searchsorted(nxt[1], start) + next_offset
+                hi = np.searchsorted(nxt[1], start + count) + next_offset
+                self.child_lo[offset:next_offset] = np.where(split, lo, 0)
+                self.child_hi[offset:next_offset] = np.where(split, hi, 0)
+            offset += len(start)
+
+        self.masses = mass
+        self.x = x
+        self.y = y
+
+    def accelerations(self, targets, theta, potential=False):
+        """Return the summed m * d / |d|^3 pull on each target body, opening nodes with size / d >= theta.
+
+        With potential=True also returns the summed m / |d| of each target, from the same interactions.
+        """
+        n = len(self.x)
+        ax = np.zeros(n)
+        ay = np.zeros(n)
+        pot = np.zeros(n) if potential else None
+        if not n or not len(targets):
+            return (ax, ay, pot) if potential else (ax, ay)
+
+        body = np.asarray(targets, dtype=np.int64)
+        node = np.zeros(len(body), dtype=np.int64)  # Every target starts at the root
+        theta_sq = theta * theta
+
+        while body.size:
+            dx = self.cx[node] - self.x[body]
+            dy = self.cy[node] - self.y[body]
+            dist_sq = dx * dx + dy * dy
+
+            leaf = self.child_hi[node] == 0
+            contains = (self.keys[body] >> self.shift[node]) == self.prefix[node]
+            near = self.size[node] ** 2 >= theta_sq * dist_sq
+            opened = ~leaf & (contains | near)
+
+            # Crowded cells at maximum depth are summed body by body
+            bucket = leaf & (self.count[node] > 1)
+
+            # Far clusters and single-body leaves act through their center of mass
+            single = ~opened & ~bucket
+            self._add(ax, ay, body[single], dx[single], dy[single], dist_sq[single], self.mass[node[single]], pot)
+
+            if bucket.any():
+                members, owner = expand_ranges(self.start[node[bucket]], self.count[node[bucket]], body[bucket])
+                src = self.order[members]
+                bdx = self.x[src] - self.x[owner]
+                bdy = self.y[src] - self.y[owner]
+                self._add(ax, ay, owner, bdx, bdy, bdx * bdx + bdy * bdy, self.masses[src], pot)
+
+            children, body = expand_ranges(self.child_lo[node[opened]],
+                                     self.child_hi[node[opened]] - self.child_lo[node[opened]],
+                                     body[opened])
+            node = children
+
+        return (ax, ay, pot) if potential else (ax, ay)
+
+    @staticmethod
+    def _add(ax, ay, body, dx, dy, dist_sq, mass, pot=None):
+        """Accumulate pulls into ax/ay (and m / |d| into pot); zero distances (a body and itself) contribute nothing."""
+        with np.errstate(divide="ignore"):
+            weight = np.where(dist_sq > 0, mass * dist_sq ** -1.5, 0.0)
+        n = len(ax)
+        ax += np.bincount(body, weights=weight * dx, minlength=n)
+        ay += np.bincount(body, weights=weight * dy, minlength=n)
+        if pot is not None:
+            pot += np.bincount(body, weights=weight * dist_sq, minlength=n)
+
@@ -0,0 +1,257 @@
+import math
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from planet import animated_color, draw_black_hole
+from settings import LABEL_CACHE_SIZE, BLACK_HOLE_PHASES
+
+# Transparent color of black hole sprites; never produced by the black hole palette
+SPRITE_COLORKEY = (255, 0, 255)
+
+# Labels are blitted up to 40 px above a body; mass labels are at most about this wide
+LABEL_HEIGHT = 40
+LABEL_HALF_WIDTH = 80
+
+# More changed regions than this in one frame are cheaper to redraw as a full frame
+DIRTY_RECT_LIMIT = 64
+
+
+class LabelCache:
+    """LRU cache of rendered text surfaces, keyed on the label string and style.
+
+    Exposes the same render() call as a pygame font, so it can be passed to
+    Body.draw in place of the font. Mass labels rarely change and radius labels
+    are integer-rounded, so after the first frame almost every label is a hit.
+    """
+
+    def __init__(self, font, max_size=LABEL_CACHE_SIZE):
+        self.font = font
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def render(self, text, antialias, color, background=None):
+        key = (text, antialias, tuple(color), None if background is None else tuple(background))
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        if background is None:
+            surface = self.font.render(text, antialias, color)
+        else:
+            surface = self.font.render(text, antialias, color, background)
+        self._surfaces[key] = surface
+
+        # Evict the least recently used labels
+        while len(self._surfaces) > self.max_size:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self._surfaces.clear()
+
+    def __len__(self):
+        return len(self._surfaces)
+
+
+class BlackHoleSprites:
+    """Pre-rendered black hole frames (core, ring and accretion disk) keyed by radius and animation phase.
+
+    The shape depends only on the radius and the color only on sin(time), so one
+    period of the animation is quantized into `phases` frames that are drawn once
+    and blitted afterwards. Frames for a radius are built on first use and kept
+    until clear().
+    """
+
+    def __init__(self, phases=BLACK_HOLE_PHASES):
+        self.phases = phases
+        self.hits = 0
+        self.misses = 0
+        self._frames = {}
+
+    def phase(self, time):
+        """Animation frame index of a time; works on scalars and arrays (as floats)."""
+        return (time % (2 * math.pi)) / (2 * math.pi) * self.phases // 1 % self.phases
+
+    def get(self, radius, time):
+        """Return (surface, (offset_x, offset_y)); blit the surface at (x - offset_x, y - offset_y)."""
+        phase = int(self.phase(time))
+        key = (radius, phase)
+        frame = self._frames.get(key)
+        if frame is not None:
+            self.hits += 1
+            return frame
+
+        self.misses += 1
+        frame = self._render(radius, (phase + 0.5) / self.phases * 2 * math.pi)
+        self._frames[key] = frame
+        return frame
+
+    @staticmethod
+    def _render(radius, time):
+        # Large enough for the disk (2.5 r wide each side) and the ring (1.2 r plus its width)
+        half_width = int(math.ceil(radius * 2.5)) + 2
+        half_height = int(math.ceil(radius * 1.2)) + 8
+        surface = pygame.Surface((2 * half_width, 2 * half_height))
+
+        # The drawing is not antialiased, so a color key gives exact edges and much faster
+        # (RLE-accelerated) blits than per-pixel alpha
+        surface.fill(SPRITE_COLORKEY)
+        draw_black_hole(surface, half_width, half_height, radius, animated_color(time))
+        surface.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        return surface, (half_width, half_height)
+
+    def clear(self):
+        self._frames.clear()
+
+    def __len__(self):
+        return len(self._frames)
+
+
+def body_rects(store, x, y, label_min_radius=0):
+    """Screen bounding boxes (left, top, right, bottom) of every body drawn at (x, y), labels included."""
+    radius = store.radius
+    black_hole = store.black_hole
+    # Black holes extend to their accretion disk and ring, like their sprites
+    half_width = np.where(black_hole, np.ceil(radius * 2.5) + 2, np.ceil(radius) + 1)
+    half_height = np.where(black_hole, np.ceil(radius * 1.2) + 8, np.ceil(radius) + 1)
+    above = half_height
+    labelled = radius >= label_min_radius
+    half_width = np.where(labelled, np.maximum(half_width, LABEL_HALF_WIDTH), half_width)
+    above = np.where(labelled, np.maximum(above, np.ceil(radius) + LABEL_HEIGHT), above)
+
+    cx = x.astype(np.int64)
+    cy = y.astype(np.int64)
+    return (cx - half_width.astype(np.int64), cy - above.astype(np.int64),
+            cx + half_width.astype(np.int64), cy + half_height.astype(np.int64))
+
+
+def visible(rects, width, height):
+    """Mask of the bodies whose bounding box overlaps the screen rect (0, 0, width, height)."""
+    left, top, right, bottom = rects
+    return (right > 0) & (left < width) & (bottom > 0) & (top < height)
+
+
+def overlapping(rects, rect, mask=None):
+    """Indices of the bodies whose bounding box overlaps a pygame.Rect, optionally within a mask."""
+    left, top, right, bottom = rects
+    hit = (right > rect.left) & (left < rect.right) & (bottom > rect.top) & (top < rect.bottom)
+    if mask is not None:
+        hit &= mask
+    return np.flatnonzero(hit)
+
+
+class DirtyRects:
+    """Screen regions that changed since the previous frame, for pygame.display.update.
+
+    Keeps every body's bounding box and drawn state (integer position, radius, mass,
+    black hole animation phase) from the last frame. A body whose state changed dirties
+    the union of its old and new boxes. changed() returns None when the frame must be
+    redrawn in full: on the first frame, after bodies were added or removed (indices
+    shift), after invalidate(), or when too many regions changed to be worth it.
+    """
+
+    def __init__(self, limit=DIRTY_RECT_LIMIT):
+        self.limit = limit
+        self._rects = None
+        self._state = None
+
+    def invalidate(self):
+        self._rects = None
+        self._state = None
+
+    def changed(self, rects, state):
+        previous_rects, previous_state = self._rects, self._state
+        self._rects, self._state = rects, state
+        if previous_rects is None or len(previous_rects[0]) != len(rects[0]):
+            return None
+
+        moved = np.zeros(len(rects[0]), dtype=bool)
+        for old, new in zip(previous_state + previous_rects, state + rects):
+            moved |= old != new
+        moved = np.flatnonzero(moved)
+        if len(moved) > self.limit:
+            return None
+
+        left = np.minimum(previous_rects[0][moved], rects[0][moved]).tolist()
+        top = np.minimum(previous_rects[1][moved], rects[1][moved]).tolist()
+        right = np.maximum(previous_rects[2][moved], rects[2][moved]).tolist()
+        bottom = np.maximum(previous_rects[3][moved], rects[3][moved]).tolist()
+        return [pygame.Rect(l, t, r - l, b - t) for l, t, r, b in zip(left, top, right, bottom)]
+
+
+class Renderer:
+    """Draws frames of a BodyStore, configured by a config.Config.
+
+    Owns the label cache, the black hole sprites and the dirty rectangle tracking.
+    Bodies entirely off screen are culled; with config.DIRTY_RECTS only the regions
+    that changed since the previous frame are redrawn and passed to the display.
+    """
+
+    def __init__(self, screen, font, config):
+        self.screen = screen
+        self.config = config
+        self.labels = LabelCache(font, config.LABEL_CACHE_SIZE)  # Labels are rasterized once and reused
+        self.black_hole_sprites = BlackHoleSprites(config.BLACK_HOLE_PHASES)
+        self.dirty_rects = DirtyRects()
+        self._overlay_rects = []  # Where the previous frame's overlays were drawn
+
+    def invalidate(self):
+        """Redraw the next frame in full (e.g. after a background or HUD change)."""
+        self.dirty_rects.invalidate()
+
+    def draw(self, store, x, y, background, overlays=()):
+        """Draw every body at (x, y), then the overlays ((surface, (left, top)) pairs), and update the display."""
+        config = self.config
+        screen = self.screen
+        rects = body_rects(store, x, y, config.LABEL_MIN_RADIUS)
+        on_screen = visible(rects, config.SCREEN_WIDTH, config.SCREEN_HEIGHT)
+
+        changed = None
+        if config.DIRTY_RECTS:
+            phase = self.black_hole_sprites.phase(store.time).astype(int)
+            # Copies: the store's columns change in place, so views would always compare equal next frame
+            state = (x.astype(int), y.astype(int), store.radius.copy(), store.mass.copy(),
+                     store.color[:, 0].copy(), store.color[:, 1].copy(), store.color[:, 2].copy(),
+                     np.where(store.black_hole, phase, 0))
+            changed = self.dirty_rects.changed(rects, state)
+
+        views = store.views()
+        overlay_rects = [surface.get_rect(topleft=position) for surface, position in overlays]
+        if changed is None:
+            # Full frame
+            screen.fill(background)
+            regions = [None]
+        else:
+            # Only the changed regions, plus the overlays (the timer changes every frame) where they are
+            # now and where they were, so a shorter or removed overlay leaves nothing behind
+            regions = changed + overlay_rects + self._overlay_rects
+        self._overlay_rects = overlay_rects
+
+        for region in regions:
+            if region is None:
+                indices = np.flatnonzero(on_screen)
+            else:
+                # Clipped, so bodies overlapping the region are redrawn in their original order
+                screen.set_clip(region)
+                screen.fill(background)
+                indices = overlapping(rects, region, on_screen)
+            for i in indices.tolist():
+                views[i].draw(screen, self.labels, (float(x[i]), float(y[i])), config.LABEL_MIN_RADIUS,
+                              self.black_hole_sprites)  # Pass the label cache as the font
+            for surface, position in overlays:
+                screen.blit(surface, position)
+        screen.set_clip(None)
+
+        if changed is None:
+            pygame.display.flip()
+        elif regions:
+            pygame.display.update(regions)
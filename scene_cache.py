@@ -0,0 +1,111 @@
+"""Cache of materialized build file scenes, so an unchanged build.txt is not parsed again.
+
+A scene is keyed on a hash of the build file's bytes, the default seed, the
+screen size used by random generation and CACHE_VERSION (bump it whenever
+parsing or generation changes). Its bodies are stored as one structured .npy
+array, memory-mapped when loaded, next to a .json file with the build settings.
+Files are written under a temporary name and renamed into place, so instances
+starting at the same time never read a half-written scene.
+
+Scenes with r() or sr() and no seed are random on every launch and never cached.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+
+import numpy as np
+
+from parse import parse_build_file
+from bodies import BodyStore
+from settings import SCREEN_WIDTH, SCREEN_HEIGHT, SEED, SCENE_CACHE
+
+CACHE_VERSION = 1
+
+# One cached body
+BODY_DTYPE = np.dtype([("x", "f8"), ("y", "f8"), ("vx", "f8"), ("vy", "f8"), ("mass", "f8"),
+                       ("color", "u1", (3,)), ("black_hole", "?")])
+
+_RANDOM_DIRECTIVE = re.compile(rb"^\s*s?r\s*\(", re.MULTILINE)
+
+
+def scene_key(source, seed=SEED):
+    """Hex digest identifying the scene built from a build file's bytes."""
+    digest = hashlib.sha256()
+    digest.update(f"flant scene {CACHE_VERSION} {SCREEN_WIDTH}x{SCREEN_HEIGHT} seed={seed}\n".encode())
+    digest.update(source)
+    return digest.hexdigest()
+
+
+def _paths(cache_dir, key):
+    return os.path.join(cache_dir, key + ".npy"), os.path.join(cache_dir, key + ".json")
+
+
+def load_cached(cache_dir, key):
+    """(BodyStore, settings) of a cached scene, or None if it is missing or unreadable."""
+    bodies_path, settings_path = _paths(cache_dir, key)
+    try:
+        with open(settings_path, "r") as file:
+            settings = json.load(file)
+        bodies = np.load(bodies_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if bodies.dtype != BODY_DTYPE:
+        return None
+
+    store = BodyStore(max(len(bodies), 64))
+    store.extend(bodies["x"], bodies["y"], bodies["mass"], bodies["color"], bodies["vx"], bodies["vy"],
+                 bodies["black_hole"])
+    # JSON has no tuples (COLOR)
+    settings = {name: tuple(value) if isinstance(value, list) else value for name, value in settings.items()}
+    return store, settings
+
+
+def _write_atomic(path, write):
+    directory = os.path.dirname(path)
+    with tempfile.NamedTemporaryFile("wb", dir=directory, suffix=".tmp", delete=False) as file:
+        write(file)
+    os.replace(file.name, path)
+
+
+def save_cached(cache_dir, key, store, settings):
+    os.makedirs(cache_dir, exist_ok=True)
+    bodies = np.empty(len(store), dtype=BODY_DTYPE)
+    for name in ("x", "y", "vx", "vy", "mass", "color", "black_hole"):
+        bodies[name] = getattr(store, name)
+
+    bodies_path, settings_path = _paths(cache_dir, key)
+    _write_atomic(bodies_path, lambda file: np.save(file, bodies))
+    _write_atomic(settings_path, lambda file: file.write(json.dumps(settings).encode()))
+
+
+def load_scene(file_path, cache_dir=SCENE_CACHE, seed=SEED):
+    """Bodies and build settings of a build file, from the cache when the file is unchanged.
+
+    Returns (BodyStore, settings dict); the settings only live in memory and override
+    the settings.py defaults for this run. cache_dir = None or "" disables the cache.
+    """
+    try:
+        with open(file_path, "rb") as file:
+            source = file.read()
+    except OSError:
+        return parse_build_file(file_path)  # Logs the missing file
+
+    key = scene_key(source, seed) if cache_dir else None
+    if key is not None:
+        cached = load_cached(cache_dir, key)
+        if cached is not None:
+            logging.info(f"Loaded {len(cached[0])} bodies from the scene cache for {file_path}")
+            return cached
+
+    store, settings = parse_build_file(file_path)
+
+    random_scene = _RANDOM_DIRECTIVE.search(source) and settings.get("SEED", seed) is None
+    if key is not None and not random_scene:
+        try:
+            save_cached(cache_dir, key, store, settings)
+        except OSError as e:
+            logging.error(f"Failed to write the scene cache: {e}")
+    return store, settings
@@ -10,3 +10,35 @@ G = 0.5
 c = 299792458
 LOG_TOGGLE = True
 RGB_TOGGLE = True
+GRAVITY_MODE = 'numpy'
+THETA = 0.5
+PHYSICS_HZ = 60
+MAX_CATCHUP_STEPS = 5
+INTEGRATOR = 'euler'
+STEP_SIZE = 1.0
+ADAPTIVE_ETA = 0.05
+ADAPTIVE_MAX_LEVEL = 8
+WORKERS = 0
+LABEL_CACHE_SIZE = 1024
+LABEL_MIN_RADIUS = 0
+BLACK_HOLE_PHASES = 64
+DIRTY_RECTS = False
+SEED = None
+SCENE_CACHE = '.scene_cache'
+LOG_LEVEL = 'INFO'
+LOG_LEVELS = {}
+LOG_RATE = 20
+LOG_STATE_EVERY = 60
+EVENT_LOG_FILE = 'events.bin'
+PROFILE_HUD = False
+PROFILE_HISTORY = 600
+PROFILE_EXPORT = 'profile.csv'
+SNAPSHOT_FILE = 'snapshot.npz'
+TRAJECTORY_FILE = ''
+TRAJECTORY_STRIDE = 1
+TRAJECTORY_DTYPE = 'float32'
+TRAJECTORY_CHUNK = 64
+COLLISION_MODE = 'bounce'
+RESTITUTION = 1.0
+DIAGNOSTICS_EVERY = 0
+DRIFT_THRESHOLD = 0.01
@@ -0,0 +1,194 @@
+import time
+
+import numpy as np
+
+from broadphase import find_collisions
+from config import Config
+from diagnostics import Diagnostics
+from integrators import INTEGRATORS
+from physics import accelerations, resolve_collision, KE_CONVERSION, COLLISION_MODES
+from planet import MASS_UNIT
+from utils import check_collision
+
+
+class Simulation:
+    """One simulation step (collisions, then gravity and motion through an integrator) over a BodyStore.
+
+    Has no pygame dependency, so it drives both the windowed loop in main.py and
+    the headless runner.
+    """
+
+    def __init__(self, store, config=None, events=None, profiler=None):
+        config = Config() if config is None else config
+        if config.INTEGRATOR not in INTEGRATORS:
+            raise ValueError(f"Unknown integrator: {config.INTEGRATOR}")
+        if config.COLLISION_MODE not in COLLISION_MODES:
+            raise ValueError(f"Unknown collision mode: {config.COLLISION_MODE}")
+
+        # The configuration is read once here; build a new Simulation to change it
+        self.store = store
+        self.config = config
+        self.time_step = config.TIME_STEP
+        self.g = config.G
+        self.events = events  # eventlog.EventLog for collision and absorption records, or None
+        self.profiler = profiler  # profiler.Profiler to time the stages into, or None to time nothing
+        self.gravity_mode = config.GRAVITY_MODE
+        self.theta = config.THETA
+        self.collision_mode = config.COLLISION_MODE
+        self.restitution = config.RESTITUTION
+        self.workers = config.WORKERS  # Processes for the parallel gravity mode, 0 for every core
+        self.integrator = config.INTEGRATOR
+        self.step_size = config.STEP_SIZE  # Step length in original one-step-per-frame units
+        self.integrator_options = {}
+        if config.INTEGRATOR == "adaptive":
+            self.integrator_options = {"eta": config.ADAPTIVE_ETA, "max_level": config.ADAPTIVE_MAX_LEVEL}
+
+        self.steps = 0
+        self.simulated_time = 0.0
+        self.force_evaluations = 0
+        self.body_force_evaluations = 0  # Bodies whose acceleration was computed, summed over evaluations
+        self.level_counts = None  # Bodies per time step level, for the adaptive integrator
+        self.collisions = 0
+        self.absorbed = 0  # Bodies removed by black holes or merged into another planet
+        self.collision_candidates = 0  # Broad-phase candidate pairs in the last step
+
+        # Energy and momentum sampled every DIAGNOSTICS_EVERY steps (0 turns the diagnostics off)
+        self.diagnostics = None
+        if config.DIAGNOSTICS_EVERY > 0:
+            self.diagnostics = Diagnostics(config.DIAGNOSTICS_EVERY, config.DRIFT_THRESHOLD,
+                                           (config.SCREEN_WIDTH / 2, config.SCREEN_HEIGHT / 2))
+        self._capture = False  # Whether full gravity evaluations also return the potential
+        self._potentials = []  # (x, y, potential) of those evaluations, for the next diagnostics sample
+
+    def collide(self):
+        """Detect and resolve collisions; absorbed planets are removed in one batch at the end."""
+        store = self.store
+        profiler = self.profiler
+        if profiler is not None:
+            start = time.perf_counter()
+        pairs_i, pairs_j, self.collision_candidates = find_collisions(store.x, store.y, store.radius,
+                                                                      store.black_hole)
+        if profiler is not None:
+            detected = time.perf_counter()
+            profiler.add("collision_detection", detected - start)
+        for i, j in zip(pairs_i.tolist(), pairs_j.tolist()):
+            p1, p2 = store.view(i), store.view(j)
+            # Earlier resolutions this step may have absorbed or moved either planet
+            if store.is_removed(i) or store.is_removed(j) or not check_collision(p1, p2):
+                continue
+            if self.events is not None:
+                self.events.debug("collision", f"Collision detected between planet {i} and planet {j}")
+            resolve_collision(p1, p2, store, self.g, self.time_step, self.events, self.collision_mode,
+                              self.restitution)
+            store.accel_valid = False
+            self.collisions += 1
+
+        self.absorbed += store.flush_removed()
+        if profiler is not None:
+            profiler.add("collision_resolution", time.perf_counter() - detected)
+
+    def accelerations(self, x, y, targets=None):
+        """Gravity at positions (x, y), scaled by TIME_STEP like the original velocity kick."""
+        self.force_evaluations += 1
+        self.body_force_evaluations += len(x) if targets is None else len(targets)
+        profiler = self.profiler
+        if profiler is not None:
+            start = time.perf_counter()
+        if self._capture and targets is None:
+            ax, ay, phi = accelerations(x, y, self.store.mass, self.store.black_hole, self.gravity_mode, self.theta,
+                                        targets, self.workers, self.g, potential=True)
+            self._potentials.append((x.copy(), y.copy(), phi))
+        else:
+            ax, ay = accelerations(x, y, self.store.mass, self.store.black_hole, self.gravity_mode, self.theta,
+                                   targets, self.workers, self.g)
+        if profiler is not None:
+            profiler.add("gravity", time.perf_counter() - start)
+        return ax * self.time_step, ay * self.time_step
+
+    def step(self):
+        if self.events is not None:
+            self.events.step = self.steps
+        self.collide()
+
+        sample = None
+        diagnostics = self.diagnostics
+        if diagnostics is not None:
+            # A sample is the state after the collisions, before the integrator moves anything. Its potential
+            # comes from an evaluation at those positions: the first one of this step (euler, rk4, leapfrog
+            # after a collision) or the last one of the step before (leapfrog's cached accelerations).
+            self._capture = ((diagnostics.due(self.steps) or diagnostics.due(self.steps + 1))
+                             and self.gravity_mode in ("numpy", "barnes_hut"))
+            self._potentials = self._potentials[-1:] if self._capture else []
+            if diagnostics.due(self.steps):
+                store = self.store
+                sample = (store.x.copy(), store.y.copy(), store.vx.copy(), store.vy.copy(), store.mass.copy(),
+                          store.black_hole.copy())
+
+        profiler = self.profiler
+        if profiler is not None:
+            start, gravity = time.perf_counter(), profiler.current["gravity"]
+        level_counts = INTEGRATORS[self.integrator](self.store, self.accelerations, self.step_size,
+                                                    **self.integrator_options)
+        if profiler is not None:
+            # The integrator's own work: its time minus the gravity evaluations it made
+            profiler.add("integration", time.perf_counter() - start - (profiler.current["gravity"] - gravity))
+        if level_counts is not None:
+            self.level_counts = level_counts
+        if sample is not None:
+            self._sample_diagnostics(*sample)
+        self.store.time += 0.01 * self.step_size
+        self.steps += 1
+        self.simulated_time += self.step_size
+
+    def _sample_diagnostics(self, x, y, vx, vy, mass, black_hole):
+        for px, py, phi in self._potentials:
+            if len(px) == len(x) and np.array_equal(px, x) and np.array_equal(py, y):
+                reused = True
+                break
+        else:
+            # No evaluation at the sampled positions (python or parallel gravity, adaptive steps): one extra pass
+            mode = self.gravity_mode if self.gravity_mode in ("numpy", "barnes_hut") else "numpy"
+            phi = accelerations(x, y, mass, black_hole, mode, self.theta, None, self.workers, self.g,
+                                potential=True)[2]
+            reused = False
+
+        if self.diagnostics.record(self.steps, x, y, vx, vy, mass, phi, self.time_step, reused):
+            if self.events is not None:
+                latest = self.diagnostics.latest()
+                self.events.warning("diagnostics", f"Drift past {self.diagnostics.threshold:g} at step {self.steps}: "
+                                                   f"energy {latest['energy_drift']:.3g}, "
+                                                   f"momentum {latest['momentum_drift']:.3g}, "
+                                                   f"angular momentum {latest['angular_drift']:.3g}")
+
+    def run(self, steps):
+        for _ in range(steps):
+            self.step()
+
+    def summary(self):
+        """Summary statistics of the current state, as plain JSON-friendly values."""
+        store = self.store
+        mass = store.mass
+        total_mass = float(mass.sum())
+        kinetic = 0.5 * (mass * MASS_UNIT) * (store.vx ** 2 + store.vy ** 2)
+
+        if total_mass > 0:
+            center = [float(np.dot(mass, store.x) / total_mass), float(np.dot(mass, store.y) / total_mass)]
+        else:
+            center = [0.0, 0.0]
+
+        return {
+            "steps": self.steps,
+            "simulated_time": self.simulated_time,
+            "force_evaluations": self.force_evaluations,
+            "body_force_evaluations": self.body_force_evaluations,
+            "level_counts": None if self.level_counts is None else self.level_counts.tolist(),
+            "bodies": len(store),
+            "black_holes": int(store.black_hole.sum()),
+            "collisions": self.collisions,
+            "absorbed": self.absorbed,
+            "total_mass": total_mass,
+            "center_of_mass": center,
+            "kinetic_energy_tj": float(kinetic.sum() / KE_CONVERSION),
+            "diagnostics": None if self.diagnostics is None else self.diagnostics.latest(),
+            "drift_alarms": None if self.diagnostics is None else self.diagnostics.alarms,
+        }
@@ -0,0 +1,89 @@
+"""Snapshots of a running simulation, to resume it later exactly where it was.
+
+A snapshot is one uncompressed .npz file: every BodyStore field (including the
+animation time of each body and the cached accelerations) plus a JSON "meta"
+entry with the configuration, the Simulation counters and the caller's runtime
+state (main.py stores the pause state, the timer and the background color).
+Loading is a straight copy of the arrays, with no parsing or generation.
+
+    save_snapshot("run.npz", simulation, {"paused": False})
+    simulation, state = resume("run.npz")
+"""
+import json
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+from bodies import BodyStore
+from config import Config
+from simulation import Simulation
+
+SNAPSHOT_VERSION = 1
+
+# Simulation attributes saved with the bodies
+COUNTERS = ("steps", "simulated_time", "force_evaluations", "body_force_evaluations", "collisions", "absorbed")
+
+
+class Snapshot(NamedTuple):
+    store: BodyStore
+    config: Config
+    counters: dict
+    state: dict
+
+
+def save_snapshot(path, simulation, state=None):
+    """Write the simulation's bodies, configuration and counters, plus a dict of JSON-friendly runtime state."""
+    counters = {name: getattr(simulation, name) for name in COUNTERS}
+    counters["level_counts"] = None if simulation.level_counts is None else simulation.level_counts.tolist()
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "config": simulation.config.as_dict(),
+        "counters": counters,
+        "state": state or {},
+        "accel_valid": simulation.store.accel_valid,
+    }
+    arrays = {"body_" + name: values for name, values in simulation.store.arrays().items()}
+
+    # Written under a temporary name and renamed, so an interrupted save never replaces a good snapshot
+    with open(path + ".tmp", "wb") as file:
+        np.savez(file, meta=np.array(json.dumps(meta)), **arrays)
+    os.replace(path + ".tmp", path)
+
+
+def _tuples(value):
+    # JSON has no tuples (COLOR, WHITE, ...)
+    return tuple(value) if isinstance(value, list) else value
+
+
+def load_snapshot(path):
+    """Read a snapshot file; raises ValueError if it is not a snapshot this version can load."""
+    with np.load(path, allow_pickle=False) as data:
+        if "meta" not in data:
+            raise ValueError(f"{path} is not a snapshot")
+        meta = json.loads(str(data["meta"]))
+        if meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is a version {meta.get('version')} snapshot, expected {SNAPSHOT_VERSION}")
+        arrays = {name[len("body_"):]: data[name] for name in data.files if name.startswith("body_")}
+
+    store = BodyStore.from_arrays(arrays, meta["accel_valid"])
+    # Settings added since the snapshot was taken keep their defaults
+    config = Config()
+    config.update(**{name: _tuples(value) for name, value in meta["config"].items() if hasattr(config, name)})
+    return Snapshot(store, config, meta["counters"], meta["state"])
+
+
+def restore_counters(simulation, counters):
+    """Continue a Simulation's step count and statistics from a snapshot's counters."""
+    for name in COUNTERS:
+        setattr(simulation, name, counters[name])
+    level_counts = counters["level_counts"]
+    simulation.level_counts = None if level_counts is None else np.array(level_counts)
+
+
+def resume(path, events=None, profiler=None):
+    """(Simulation, runtime state) continuing from a snapshot file."""
+    snapshot = load_snapshot(path)
+    simulation = Simulation(snapshot.store, snapshot.config, events, profiler)
+    restore_counters(simulation, snapshot.counters)
+    return simulation, snapshot.state
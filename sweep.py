@@ -0,0 +1,137 @@
+"""Parameter sweep: run every combination of G, time step and seed of one build file, headless and in parallel.
+
+    python sweep.py build.txt --g 0.25 0.5 1 --tstep 1 3 --seed 1 2 3 --steps 1000 --results sweep.jsonl
+
+Each finished run is appended to the results file as one JSON line (its
+parameters and Simulation.summary()) as soon as it completes. Starting the same
+sweep again skips every run already in the results file with the same build
+file contents and step count, so a killed sweep continues where it stopped.
+
+Variants never touch settings.py: a seed is applied by appending "seed = N" to
+the build text (the last setting wins) and G and TIME_STEP by Config.replace.
+The runs themselves use every core, so the parallel gravity mode runs as numpy.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import time
+from multiprocessing import Pool
+
+from config import Config
+from parse import parse_build_text
+from simulation import Simulation
+
+
+def variants(g_values=(None,), time_steps=(None,), seeds=(None,)):
+    """Every combination of the parameter values, as dicts (None keeps the build file's value)."""
+    return [{"g": g, "tstep": time_step, "seed": seed}
+            for g, time_step, seed in itertools.product(g_values, time_steps, seeds)]
+
+
+def _run(task):
+    """Pool worker: build and run one variant; returns its result line as a dict."""
+    text, build_file, build_hash, params, steps = task
+    logging.getLogger().setLevel(logging.WARNING)  # One summary line per body batch and run would flood the console
+    result = {"build_file": build_file, "build_sha256": build_hash, "steps": steps, **params}
+    try:
+        if params["seed"] is not None:
+            text += f"\nseed = {params['seed']}\n"
+        store, settings = parse_build_text(text, build_file)
+
+        config = Config(**settings)
+        overrides = {"G": params["g"], "TIME_STEP": params["tstep"]}
+        config = config.replace(**{name: value for name, value in overrides.items() if value is not None})
+        if config.GRAVITY_MODE == "parallel":
+            config.update(GRAVITY_MODE="numpy")  # Pool workers cannot start a pool of their own
+
+        simulation = Simulation(store, config)
+        start = time.perf_counter()
+        simulation.run(steps)
+        elapsed = time.perf_counter() - start
+
+        result.update(simulation.summary())
+        result["g"], result["tstep"], result["seed"] = config.G, config.TIME_STEP, config.SEED
+        result["wall_time_s"] = elapsed
+        result["steps_per_sec"] = steps / elapsed if elapsed > 0 else None
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["params"] = params
+    return result
+
+
+def completed(results_file, build_hash, steps):
+    """Parameter sets already run successfully for this build file and step count."""
+    done = set()
+    if not os.path.isfile(results_file):
+        return done
+    with open(results_file, "r") as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # A line cut short when the sweep was killed
+            if result.get("build_sha256") == build_hash and result.get("steps") == steps and "error" not in result:
+                done.add(json.dumps(result["params"], sort_keys=True))
+    return done
+
+
+def sweep(build_file, grid, steps, results_file, jobs=None):
+    """Run every variant of `grid` not yet in `results_file`, appending each result as it finishes.
+
+    Returns the results of the runs made by this call.
+    """
+    with open(build_file, "rb") as file:
+        source = file.read()
+    build_hash = hashlib.sha256(source).hexdigest()
+    text = source.decode()
+
+    done = completed(results_file, build_hash, steps)
+    pending = [params for params in grid if json.dumps(params, sort_keys=True) not in done]
+    logging.info(f"Sweep of {len(grid)} runs: {len(grid) - len(pending)} already done, {len(pending)} to run")
+    if not pending:
+        return []
+
+    # Start on a fresh line if the last run was killed halfway through writing its result
+    if os.path.isfile(results_file) and os.path.getsize(results_file):
+        with open(results_file, "rb") as file:
+            file.seek(-1, os.SEEK_END)
+            partial = file.read(1) != b"\n"
+    else:
+        partial = False
+
+    results = []
+    tasks = [(text, build_file, build_hash, params, steps) for params in pending]
+    with open(results_file, "a") as output, Pool(jobs or os.cpu_count()) as pool:
+        if partial:
+            output.write("\n")
+        for result in pool.imap_unordered(_run, tasks):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            results.append(result)
+            if "error" in result:
+                logging.error(f"Run {result['params']} failed: {result['error']}")
+            else:
+                logging.info(f"Run {result['params']}: {result['bodies']} bodies, "
+                             f"{result['steps_per_sec']:.1f} steps/s ({len(results)}/{len(pending)})")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a build file over a grid of G, time step and seed values.")
+    parser.add_argument("build_file", nargs="?", default="build.txt")
+    parser.add_argument("--g", type=float, nargs="+", default=[None], help="Gravitational constants")
+    parser.add_argument("--tstep", type=float, nargs="+", default=[None], help="Time steps")
+    parser.add_argument("--seed", type=int, nargs="+", default=[None], help="Seeds for r() and sr()")
+    parser.add_argument("--steps", type=int, default=1000, help="Simulation steps per run")
+    parser.add_argument("--results", default="sweep.jsonl", help="JSON Lines file the results are appended to")
+    parser.add_argument("--jobs", type=int, help="Runs at a time (default: every core)")
+    args = parser.parse_args()
+
+    sweep(args.build_file, variants(args.g, args.tstep, args.seed), args.steps, args.results, args.jobs)
+
+
+if __name__ == "__main__":
+    main()
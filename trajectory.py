@@ -0,0 +1,160 @@
+"""Trajectory recording into a memory-mapped binary file, and streaming reads of it.
+
+The file starts with a HEADER_SIZE-byte JSON header (body slots, float type,
+stride) followed by fixed-size frames. A frame holds x, y, vx and vy for every
+body slot as one contiguous block each, then the alive mask. Slots are body ids
+(BodyStore.id), so a body keeps its column for the whole recording; absorbed
+bodies are not alive and read as NaN. The file is preallocated TRAJECTORY_CHUNK
+frames at a time and written through a memory map.
+
+A frame is only visible to readers once its step number is in the index file
+next to it (path + ".idx", int64 steps, written out by flush() and close()), so
+a reader can seek to any step with one search and never sees a half-written
+frame.
+
+    recorder = TrajectoryRecorder("run.traj", store, stride=10)
+    recorder.record(store, simulation.steps)   # after every step
+    recorder.close()
+
+    trajectory = Trajectory("run.traj")
+    for frame in trajectory.frames(start=1000):
+        ...
+"""
+import json
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+from settings import TRAJECTORY_STRIDE, TRAJECTORY_DTYPE, TRAJECTORY_CHUNK
+
+TRAJECTORY_VERSION = 1
+HEADER_SIZE = 4096
+FIELDS = ("x", "y", "vx", "vy")
+
+
+class Frame(NamedTuple):
+    step: int
+    x: np.ndarray
+    y: np.ndarray
+    vx: np.ndarray
+    vy: np.ndarray
+    alive: np.ndarray
+
+
+def frame_dtype(bodies, dtype):
+    """One frame of `bodies` slots: each field contiguous, then the alive mask."""
+    return np.dtype([(name, dtype, (bodies,)) for name in FIELDS] + [("alive", "?", (bodies,))])
+
+
+class TrajectoryRecorder:
+    def __init__(self, path, store, stride=TRAJECTORY_STRIDE, dtype=TRAJECTORY_DTYPE, chunk=TRAJECTORY_CHUNK):
+        self.path = path
+        self.bodies = store.next_id  # One slot per body id; bodies are only ever removed while simulating
+        self.stride = max(int(stride), 1)
+        self.chunk = max(int(chunk), 1)
+        self.dtype = frame_dtype(self.bodies, np.dtype(dtype))
+        self.frames = 0  # Frames written
+
+        header = json.dumps({"version": TRAJECTORY_VERSION, "bodies": self.bodies, "dtype": np.dtype(dtype).str,
+                             "stride": self.stride}).encode()
+        if len(header) > HEADER_SIZE:
+            raise ValueError("Trajectory header too large")
+        with open(path, "wb") as file:
+            file.write(header.ljust(HEADER_SIZE, b" "))
+        self._index = open(path + ".idx", "wb")
+        self._map = None
+        self._grow()
+
+    def _grow(self):
+        """Extend the file by another chunk of frames and map it again."""
+        allocated = 0 if self._map is None else len(self._map)
+        if self._map is not None:
+            self._map.flush()
+        self._map = np.memmap(self.path, dtype=self.dtype, mode="r+", offset=HEADER_SIZE,
+                              shape=(allocated + self.chunk,))
+
+    def record(self, store, step):
+        """Store the bodies' state if `step` falls on the stride."""
+        if step % self.stride:
+            return
+        ids = store.id
+        if len(ids) and ids.max() >= self.bodies:
+            raise ValueError("Body added after the trajectory recording started")
+        if self.frames == len(self._map):
+            self._grow()
+
+        k = self.frames
+        for name in FIELDS:
+            values = self._map[name][k]
+            values[:] = np.nan
+            values[ids] = getattr(store, name)
+        alive = self._map["alive"][k]
+        alive[:] = False
+        alive[ids] = True
+        self.frames += 1
+
+        # Published after the frame data, so readers only see complete frames
+        self._index.write(np.int64(step).tobytes())
+
+    def flush(self):
+        self._map.flush()
+        self._index.flush()
+
+    def close(self):
+        """Flush and trim the preallocated frames that were never written."""
+        if self._map is None:
+            return
+        self.flush()
+        self._map = None
+        self._index.close()
+        with open(self.path, "r+b") as file:
+            file.truncate(HEADER_SIZE + self.frames * self.dtype.itemsize)
+
+
+class Trajectory:
+    """Read-only, memory-mapped view of a trajectory file; nothing is loaded until it is accessed."""
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            header = json.loads(file.read(HEADER_SIZE))
+        if header.get("version") != TRAJECTORY_VERSION:
+            raise ValueError(f"{path} is a version {header.get('version')} trajectory, "
+                             f"expected {TRAJECTORY_VERSION}")
+        self.bodies = header["bodies"]
+        self.stride = header["stride"]
+        self.dtype = frame_dtype(self.bodies, np.dtype(header["dtype"]))
+        self.steps = np.fromfile(path + ".idx", dtype=np.int64)
+
+        size = os.path.getsize(path) - HEADER_SIZE
+        self.steps = self.steps[:size // self.dtype.itemsize]  # A recorder writing right now
+        self._map = np.memmap(path, dtype=self.dtype, mode="r", offset=HEADER_SIZE,
+                              shape=(len(self.steps),)) if len(self.steps) else np.zeros(0, self.dtype)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def _frame(self, k):
+        return Frame(int(self.steps[k]), *(self._map[name][k] for name in FIELDS), self._map["alive"][k])
+
+    def index(self, step):
+        """Frame number of the last recorded frame at or before `step`."""
+        k = int(np.searchsorted(self.steps, step, side="right")) - 1
+        if k < 0:
+            raise KeyError(f"No frame at or before step {step}")
+        return k
+
+    def frame(self, step):
+        """The frame recorded at (or last before) `step`, as memory-mapped arrays."""
+        return self._frame(self.index(step))
+
+    def frames(self, start=None, stop=None):
+        """Iterate over the frames with start <= step < stop, reading one frame at a time."""
+        first = 0 if start is None else int(np.searchsorted(self.steps, start))
+        last = len(self.steps) if stop is None else int(np.searchsorted(self.steps, stop))
+        for k in range(first, last):
+            yield self._frame(k)
+
+    def body(self, body_id, field="x"):
+        """One body's values of a field at every recorded frame (NaN once it is gone)."""
+        return self._map[field][:, body_id]
@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 def distance(p1, p2):
     """Calculate distance between two points."""
     return math.hypot(p2.x - p1.x, p2.y - p1.y)
@@ -28,4 +30,10 @@ def normalize_vector(dx, dy):
     magnitude = math.hypot(dx, dy)
     if magnitude == 0:
         return 0, 0
-    return dx / magnitude, dy / magnitude
\ No newline at end of file
+    return dx / magnitude, dy / magnitude
+
+def expand_ranges(first, count, owner):
+    """Expand index ranges [first, first + count) into flat indices paired with their owner."""
+    owners = np.repeat(owner, count)
+    offsets = np.repeat(first - np.cumsum(count) + count, count)
+    return offsets + np.arange(int(count.sum())), owners
@@ -0,0 +1,238 @@
+"""Simulation thread for the windowed loop: physics runs beside input handling and drawing.
+
+The worker owns the Simulation and steps it at PHYSICS_HZ on its own thread.
+After each batch of steps it copies the bodies into the back buffer of a
+TripleBuffer and publishes it; the render loop always draws the latest
+published State, so a slow physics step no longer delays input or frames.
+The heavy gravity and collision passes run in NumPy, which releases the GIL,
+so both threads make progress at the same time.
+
+Everything that changes the simulation (pause, velocity pushes, snapshots,
+loading) goes through the command queue and runs on the worker between steps,
+so neither thread ever sees a half-finished step.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from bodies import BodyStore
+from eventlog import DEBUG
+from physics import push_radially
+from profiler import Profiler
+from trajectory import TrajectoryRecorder
+
+
+class State:
+    """One published simulation state: a copy of the bodies and what the HUD shows about them."""
+
+    def __init__(self):
+        self.store = BodyStore()
+        self.steps = 0
+        self.published = 0.0  # time.perf_counter() of the publish, for interpolating from prev_x/prev_y
+        self.paused = False
+        self.collision_candidates = 0
+        self.diagnostics = None  # Latest diagnostics sample, if the diagnostics are on
+        self.drift_alarm = False
+        self.stage_times = {}  # The worker's running stage totals in seconds, for Profiler.merge
+
+
+class TripleBuffer:
+    """Three States: one being written, the latest published one and the one being drawn.
+
+    The writer and the reader each own one buffer and only swap through the
+    middle one under a lock, so neither ever waits for the other to finish.
+    """
+
+    def __init__(self):
+        self.back = State()  # Written by the worker
+        self._ready = State()
+        self._front = State()  # Drawn by the render loop
+        self._fresh = False
+        self._lock = threading.Lock()
+
+    def publish(self):
+        with self._lock:
+            self.back, self._ready = self._ready, self.back
+            self._fresh = True
+
+    def latest(self):
+        """The most recently published State; it stays untouched until the next call."""
+        with self._lock:
+            if self._fresh:
+                self._front, self._ready = self._ready, self._front
+                self._fresh = False
+            return self._front
+
+
+class SimulationWorker(threading.Thread):
+    def __init__(self, simulation, events=None):
+        super().__init__(name="simulation", daemon=True)
+        self.events = events
+        self.commands = queue.Queue()
+        self.buffers = TripleBuffer()
+        self.paused = False
+        # Stages timed on this thread; never reset, so the render loop merges them without sharing a Profiler
+        self.stage_times = Profiler(history=1)
+        self.timing = False
+        self.error = None  # Exception that stopped the worker, re-raised by check()
+        self._stop_requested = False
+        self.recorder = None
+        self.replace(simulation)
+
+    def replace(self, simulation):
+        """Continue with another Simulation (e.g. one resumed from a snapshot). Call on the worker or before start()."""
+        self.simulation = simulation
+        simulation.profiler = self.stage_times if self.timing else None
+        config = simulation.config
+        # Fixed timestep: STEP_SIZE / PHYSICS_HZ seconds of real time per step (PHYSICS_HZ is in original
+        # one-step-per-frame units), independent of how fast frames render
+        self.step_seconds = config.STEP_SIZE / config.PHYSICS_HZ
+        self.max_catchup_steps = config.MAX_CATCHUP_STEPS
+        self.accumulator = 0.0
+
+        # Trajectories of every body, recorded every TRAJECTORY_STRIDE steps when TRAJECTORY_FILE is set;
+        # resumed bodies may not match the recording's slots, so a replaced simulation starts a new recording
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if config.TRAJECTORY_FILE:
+            self.recorder = TrajectoryRecorder(config.TRAJECTORY_FILE, simulation.store, config.TRAJECTORY_STRIDE,
+                                               config.TRAJECTORY_DTYPE, config.TRAJECTORY_CHUNK)
+            self.recorder.record(simulation.store, simulation.steps)
+        self.publish()
+
+    # Commands, called from the render loop
+
+    def submit(self, command):
+        """Run command(worker) on the worker thread between steps; returns a Future of its result."""
+        future = Future()
+        self.commands.put((command, future))
+        return future
+
+    def pause(self, paused):
+        return self.submit(lambda worker: worker._set_paused(paused))
+
+    def time_stages(self, enabled):
+        """Time the simulation stages from the next step on; the totals are published in State.stage_times."""
+        def set_timing(worker):
+            worker.timing = enabled
+            worker.simulation.profiler = worker.stage_times if enabled else None
+        return self.submit(set_timing)
+
+    def push(self, center_x, center_y, speed):
+        """Set every planet's velocity radially from (center_x, center_y); negative speeds point inward."""
+        def push_bodies(worker):
+            simulation = worker.simulation
+            push_radially(simulation.store, center_x, center_y, speed)
+            if simulation.diagnostics is not None:
+                simulation.diagnostics.reset()  # The push changes the energy and momenta on purpose
+        return self.submit(push_bodies)
+
+    def latest(self):
+        return self.buffers.latest()
+
+    def check(self):
+        """Re-raise the exception that stopped the worker, if any."""
+        if self.error is not None:
+            raise self.error
+
+    def stop(self):
+        self._stop_requested = True
+        self.commands.put(None)  # Wake the worker if it is waiting
+        self.join()
+
+    # Worker thread
+
+    def publish(self):
+        simulation = self.simulation
+        state = self.buffers.back
+        state.store.copy_from(simulation.store)
+        state.steps = simulation.steps
+        state.paused = self.paused
+        state.collision_candidates = simulation.collision_candidates
+        state.stage_times = dict(self.stage_times.current)
+        if simulation.diagnostics is not None:
+            state.diagnostics = simulation.diagnostics.latest()
+            state.drift_alarm = simulation.diagnostics.alarm
+        state.published = time.perf_counter()
+        self.buffers.publish()
+
+    def _set_paused(self, paused):
+        self.paused = paused
+        if paused:
+            # Drawn without interpolation from now on. Resuming waits for the next step to publish, since
+            # a fresh publish time would interpolate back toward the previous step's positions.
+            self.publish()
+
+    def _run_commands(self, timeout):
+        """Run queued commands, waiting up to `timeout` seconds (None: forever) for the first one."""
+        try:
+            command = self.commands.get(timeout=timeout) if timeout != 0 else self.commands.get_nowait()
+        except queue.Empty:
+            return
+        while True:
+            if command is not None:
+                function, future = command
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(function(self))
+                    except Exception as e:
+                        future.set_exception(e)
+                        # Nobody may wait on the Future, so a failed command is logged too
+                        if self.events is not None:
+                            self.events.warning("simulation", f"Command failed: {type(e).__name__}: {e}")
+            try:
+                command = self.commands.get_nowait()
+            except queue.Empty:
+                break
+
+    def _step(self):
+        simulation = self.simulation
+        store = simulation.store
+        store.save_previous()
+        simulation.step()
+        if self.recorder is not None:
+            self.recorder.record(store, simulation.steps)
+
+        events = self.events
+        if events is not None and events.enabled_for("simulation", DEBUG):
+            events.debug("simulation", f"Collision broad phase: {simulation.collision_candidates} candidate pairs "
+                                       f"for {len(store)} planets")
+            if simulation.level_counts is not None:
+                events.debug("simulation", f"Bodies per time step level: {simulation.level_counts.tolist()}")
+
+    def run(self):
+        try:
+            last = time.perf_counter()
+            while not self._stop_requested:
+                # Wait for the next step (or for a command, whichever comes first)
+                was_paused = self.paused
+                self._run_commands(None if was_paused else max(self.step_seconds - self.accumulator, 0))
+                now = time.perf_counter()
+                elapsed, last = now - last, now
+                if was_paused or self.paused or self._stop_requested:
+                    continue  # Time spent paused is not simulated
+
+                self.accumulator += elapsed
+                steps_taken = 0
+                while self.accumulator >= self.step_seconds and steps_taken < self.max_catchup_steps:
+                    self._step()
+                    self.accumulator -= self.step_seconds
+                    steps_taken += 1
+
+                # Too far behind: drop the backlog instead of spiralling into ever longer batches
+                if steps_taken == self.max_catchup_steps:
+                    self.accumulator = min(self.accumulator, self.step_seconds)
+
+                if steps_taken:
+                    # State dump into the binary event log, sampled every LOG_STATE_EVERY batches
+                    if self.events is not None:
+                        self.events.state(self.simulation.store)
+                    self.publish()
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.recorder is not None:
+                self.recorder.close()
+                self.recorder = None